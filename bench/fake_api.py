@@ -0,0 +1,234 @@
+# --- SERVIDOR FALSO DAS APIS DO RD STATION, NOTION E BOTCONVERSA ---
+"""
+Servidor HTTP local que imita os endpoints usados pelo rd_notion, com latência configurável
+e injeção de respostas 429 nos pedidos ao Notion. As rotas ficam sob /rd, /notion e /botconversa.
+"""
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+def _now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def _to_response_property(name, request_property):
+    """Converte uma propriedade no formato de pedido ({"rich_text": [...]}) para o formato devolvido pelo Notion."""
+    prop_type = next(iter(request_property))
+    value = request_property[prop_type]
+    if prop_type in ("title", "rich_text"):
+        value = [{"type": "text", "text": {"content": item["text"]["content"], "link": None},
+                  "plain_text": item["text"]["content"]} for item in (value or [])]
+    elif prop_type == "select" and value:
+        value = {"id": name[:4], "name": value["name"], "color": "default"}
+    elif prop_type == "multi_select":
+        value = [{"id": item["name"][:4], "name": item["name"], "color": "default"} for item in (value or [])]
+    elif prop_type == "number" and isinstance(value, float) and value.is_integer():
+        value = int(value) # O Notion devolve 1500 para 1500.0
+    return {"id": "title" if prop_type == "title" else name[:4], "type": prop_type, prop_type: value}
+
+class FakeAPIState:
+    """Estado em memória partilhado pelas rotas (negociações, páginas e contadores)."""
+
+    def __init__(self, database_id, schema, latency=0.0, rate_limit_rate=0.0, retry_after=0, seed=1, drop_create_rate=0.0):
+        self.database_id = database_id
+        self.schema = schema
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.drop_create_rate = drop_create_rate # Fração das criações feitas cuja resposta se perde (ligação cortada)
+        self._rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.deals_by_stage = {}
+        self.deals_by_id = {}
+        self.pages = {}
+        self.requests = {}
+        self.messages = []
+        self.rd_page_failures = {} # {(stage_id, página): nº de respostas 503 antes da resposta certa}
+
+    def load(self, deals, pages_properties, database_id=None):
+        """
+        Substitui o estado pelas negociações e páginas dadas (propriedades no formato de pedido).
+        As páginas ficam na base database_id (por omissão, a base principal).
+        """
+        with self.lock:
+            self.deals_by_stage, self.deals_by_id, self.pages, self.requests, self.messages = {}, {}, {}, {}, []
+            for deal in deals:
+                self.deals_by_stage.setdefault(deal["deal_stage"]["id"], []).append(deal)
+                self.deals_by_id[deal["id"]] = deal
+        for properties in pages_properties:
+            self.create_page(properties, database_id)
+
+    def create_page(self, properties, database_id=None):
+        page_id = str(uuid.uuid4())
+        page = {
+            "object": "page", "id": page_id, "created_time": _now_iso(), "last_edited_time": _now_iso(),
+            "archived": False, "in_trash": False, "parent": {"database_id": database_id or self.database_id},
+            "properties": {name: _to_response_property(name, prop) for name, prop in properties.items()},
+        }
+        with self.lock:
+            self.pages[page_id] = page
+        return page
+
+    def count(self, route):
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def should_rate_limit(self):
+        with self.lock:
+            return self.rate_limit_rate > 0 and self._rng.random() < self.rate_limit_rate
+
+    def should_drop_create(self):
+        with self.lock:
+            return self.drop_create_rate > 0 and self._rng.random() < self.drop_create_rate
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Mantém as ligações abertas (keep-alive), como as APIs reais
+    # Cabeçalhos e corpo seguem em escritas separadas: sem TCP_NODELAY, o Nagle junta-se ao ACK atrasado
+    # do cliente e cada resposta numa ligação reutilizada espera ~40 ms
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _handle(self, method):
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split("/") if part]
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        body = self._body() if method in ("POST", "PATCH") else {}
+        if self.state.latency: time.sleep(self.state.latency)
+        if not parts:
+            self._reply(404, {"error": "not found"}); return
+        service, rest = parts[0], parts[1:]
+        if service == "notion" and self.state.should_rate_limit():
+            self.state.count("notion 429")
+            self._reply(429, {"object": "error", "code": "rate_limited"}, {"Retry-After": str(self.state.retry_after)}); return
+        handler = getattr(self, f"_{service}", None)
+        if not handler:
+            self._reply(404, {"error": "not found"}); return
+        handler(method, rest, query, body)
+
+    def do_GET(self): self._handle("GET")
+    def do_POST(self): self._handle("POST")
+    def do_PATCH(self): self._handle("PATCH")
+
+    # --- RD Station ---
+    def _rd(self, method, parts, query, body):
+        state = self.state
+        if parts == ["deals"]:
+            state.count("rd GET /deals")
+            key = (query.get("deal_stage_id"), int(query.get("page", 1)))
+            with state.lock:
+                failing = state.rd_page_failures.get(key, 0) > 0
+                if failing: state.rd_page_failures[key] -= 1
+            if failing:
+                self._reply(503, {"error": "unavailable"}, {"Retry-After": "0"}); return
+            deals = state.deals_by_stage.get(query.get("deal_stage_id"), [])
+            page, limit = int(query.get("page", 1)), int(query.get("limit", 20))
+            chunk = deals[(page - 1) * limit:page * limit]
+            self._reply(200, {"deals": chunk, "total": len(deals), "has_more": page * limit < len(deals)})
+        elif len(parts) == 2 and parts[0] == "deals":
+            state.count("rd GET /deals/{id}")
+            deal = state.deals_by_id.get(parts[1])
+            if deal: self._reply(200, deal)
+            else: self._reply(404, {"error": "deal not found"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    # --- Notion ---
+    def _notion(self, method, parts, query, body):
+        state = self.state
+        if parts[:1] == ["databases"] and len(parts) == 2 and method == "GET":
+            state.count("notion GET /databases/{id}")
+            self._reply(200, {"object": "database", "id": parts[1], "properties": state.schema})
+        elif parts[:1] == ["databases"] and parts[2:] == ["query"]:
+            state.count("notion POST /databases/{id}/query")
+            self._reply(200, self._query(parts[1], body, query))
+        elif parts == ["pages"] and method == "POST":
+            state.count("notion POST /pages")
+            page = state.create_page(body.get("properties", {}), (body.get("parent") or {}).get("database_id"))
+            if state.should_drop_create():
+                # A página fica criada, mas o cliente não recebe resposta
+                state.count("notion POST /pages (sem resposta)")
+                self.close_connection = True; return
+            self._reply(200, page)
+        elif parts[:1] == ["pages"] and len(parts) == 2:
+            route = f"notion {method} /pages/{{id}}"
+            state.count(route)
+            with state.lock:
+                page = state.pages.get(parts[1])
+                # Como a API real: uma página arquivada só aceita o pedido que a desarquiva
+                rejected = page and method == "PATCH" and page["archived"] and "archived" not in body
+                if page and method == "PATCH" and not rejected:
+                    for name, prop in body.get("properties", {}).items():
+                        page["properties"][name] = _to_response_property(name, prop)
+                    if "archived" in body: page["archived"] = page["in_trash"] = bool(body["archived"])
+                    page["last_edited_time"] = _now_iso()
+            if rejected:
+                self._reply(400, {"object": "error", "code": "validation_error",
+                                  "message": "Can't edit block that is archived. You must unarchive the block before editing."})
+            elif page: self._reply(200, page)
+            else: self._reply(404, {"object": "error", "code": "object_not_found"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def _query(self, database_id, body, query=None):
+        """
+        Paginação por cursor e filtros por last_edited_time (on_or_after/after) e rich_text equals, como na API do Notion.
+        O parâmetro filter_properties limita as propriedades devolvidas aos IDs pedidos.
+        """
+        state = self.state
+        with state.lock:
+            pages = [page for page in state.pages.values() if not page["archived"] and page["parent"]["database_id"] == database_id]
+        time_filter = (body.get("filter") or {}).get("last_edited_time") or {}
+        property_filter = body.get("filter") or {}
+        if "property" in property_filter and "equals" in (property_filter.get("rich_text") or {}):
+            expected = property_filter["rich_text"]["equals"]
+            pages = [page for page in pages
+                     if "".join(item["plain_text"] for item in (page["properties"].get(property_filter["property"]) or {}).get("rich_text") or []) == expected]
+        if "on_or_after" in time_filter:
+            pages = [page for page in pages if page["last_edited_time"] >= time_filter["on_or_after"]]
+        if "after" in time_filter:
+            pages = [page for page in pages if page["last_edited_time"] > time_filter["after"]]
+        pages.sort(key=lambda page: page["id"])
+        start = int(body.get("start_cursor") or 0)
+        size = min(int(body.get("page_size", 100)), 100)
+        chunk = pages[start:start + size]
+        if (query or {}).get("filter_properties"):
+            wanted = query["filter_properties"]
+            chunk = [dict(page, properties={name: prop for name, prop in page["properties"].items() if prop["id"] == wanted}) for page in chunk]
+        has_more = start + size < len(pages)
+        return {"object": "list", "results": chunk, "has_more": has_more, "next_cursor": str(start + size) if has_more else None}
+
+    # --- BotConversa ---
+    def _botconversa(self, method, parts, query, body):
+        self.state.count("botconversa POST /send_message")
+        with self.state.lock:
+            self.state.messages.append(body.get("value", ""))
+        self._reply(200, {"status": "ok"})
+
+def start_fake_api(state, host="127.0.0.1", port=0):
+    """Arranca o servidor numa thread e devolve (servidor, URL base)."""
+    handler = type("BoundFakeAPIHandler", (FakeAPIHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-api", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
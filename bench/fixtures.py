@@ -0,0 +1,105 @@
+# --- DADOS SINTÉTICOS PARA O BENCHMARK ---
+"""
+Gera negociações do RD Station e páginas do Notion sintéticas, com valores realistas
+para todos os campos de NOTION_RD_MAP. A geração é determinística (seed).
+"""
+import datetime
+import random
+
+# Valores de exemplo por propriedade do Notion; campos sem lista usam um texto genérico
+SAMPLE_VALUES = {
+    "De onde é?": ["Fortaleza", "Caucaia", "Maracanaú", "Sobral", "Juazeiro do Norte", "Crato", "Eusébio"],
+    "Por que deseja a casa?": ["Sair do aluguel", "Casar", "Mais espaço para os filhos", "Morar perto do trabalho"],
+    "Recebe Bolsa Família?": ["Sim", "Não"],
+    "Profissão": ["Vendedor(a)", "Professor(a)", "Motorista", "Auxiliar administrativo", "Enfermeiro(a)", "Autônomo"],
+    "Estado Civil": ["Solteiro(a)", "Casado(a)", "União estável", "Divorciado(a)"],
+    "Dependente": ["Sim", "Não"],
+    "+3 anos CLT": ["Sim", "Não"],
+    "Faixa de Valor da Dívida": ["Sem dívidas", "Até R$ 1.000", "R$ 1.000 a R$ 5.000", "Acima de R$ 5.000"],
+    "Gênero": ["Feminino", "Masculino"],
+    "Local de Trabalho": ["Centro", "Aldeota", "Distrito Industrial", "Home office", "Messejana"],
+    "Entrada Aprovada": ["R$ 5.000,00", "R$ 10.000,00", "Sem entrada"],
+    "Saldo FGTS": ["R$ 2.340,00", "R$ 8.120,50", "Sem saldo"],
+    "OBS: entrada? FGTS? FGTS Futuro? Limite Cartão?": ["FGTS futuro", "Entrada parcelada no cartão", "Sem observações"],
+}
+NUMBER_RANGES = {
+    "Idade": (18, 70),
+    "Aluguel": (300, 1800),
+    "Prestação Máxima": (400, 2500),
+    "Parcela Aprovada": (400, 2500),
+    "Subsídio Real": (0, 55000),
+}
+FIRST_NAMES = ["Ana", "Maria", "José", "João", "Francisca", "Antônio", "Francisco", "Raimunda", "Paulo", "Luana", "Carlos", "Juliana"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Sousa", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento"]
+
+def _brl(value):
+    """Formata um número como o RD devolve (ex: 'R$ 1.234,56')."""
+    return "R$ " + f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+def _cpf(rng):
+    digits = "".join(str(rng.randint(0, 9)) for _ in range(11))
+    return f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}"
+
+def _phone(rng, i):
+    """Telefones em formatos variados, como chegam do RD."""
+    ddd = rng.choice(["85", "88", "11", "21"])
+    number = f"9{(i * 7919) % 100000000:08d}"
+    style = i % 4
+    if style == 0: return f"+55 ({ddd}) {number[:5]}-{number[5:]}"
+    if style == 1: return f"0{ddd}{number}"
+    if style == 2: return f"{ddd} {number[1:5]}-{number[5:]}"
+    return f"55{ddd}{number}"
+
+def custom_field_value(rng, notion_name, notion_type, deal_id):
+    if notion_name == "ID (RD Station)": return deal_id
+    if notion_name == "CPF (COMPRADOR)": return _cpf(rng)
+    if notion_type == "number":
+        low, high = NUMBER_RANGES.get(notion_name, (0, 10000))
+        value = rng.randint(low, high)
+        return str(value) if notion_name == "Idade" else _brl(value + rng.choice([0, 0.5, 0.99]))
+    if notion_name in SAMPLE_VALUES: return rng.choice(SAMPLE_VALUES[notion_name])
+    return f"Texto {rng.randint(1, 999)}"
+
+def generate_deals(count, stage_ids, notion_rd_map, seed=42, empty_field_rate=0.1):
+    """Gera `count` negociações no formato da API do RD, distribuídas pelas etapas."""
+    rng = random.Random(seed)
+    deals = []
+    base_time = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    for i in range(count):
+        deal_id = f"{i:024x}"
+        custom_fields = []
+        for rd_field_id, info in notion_rd_map.items():
+            # Alguns campos ficam vazios, como acontece com leads reais
+            if info["notion_name"] != "ID (RD Station)" and rng.random() < empty_field_rate: continue
+            custom_fields.append({
+                "custom_field": {"_id": rd_field_id, "label": info["notion_name"]},
+                "value": custom_field_value(rng, info["notion_name"], info["notion_type"], deal_id),
+            })
+        stage_id = stage_ids[i % len(stage_ids)]
+        deals.append({
+            "id": deal_id,
+            "_id": deal_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+            "updated_at": (base_time + datetime.timedelta(minutes=i)).isoformat(),
+            "deal_stage": {"id": stage_id, "_id": stage_id},
+            "contacts": [{"name": "Contato", "phones": [{"phone": _phone(rng, i)}]}],
+            "deal_custom_fields": custom_fields,
+        })
+    return deals
+
+def generate_pages(deals, stages_map, build_properties_payload, seed=7, changed_rate=0.1, missing_rate=0.05):
+    """
+    Gera as páginas do Notion correspondentes às negociações (no formato de pedido da API).
+    Uma fração fica com campos desatualizados (changed_rate) e outra não tem página (missing_rate).
+    Devolve a lista de propriedades por página.
+    """
+    rng = random.Random(seed)
+    pages = []
+    for deal in deals:
+        roll = rng.random()
+        if roll < missing_rate: continue
+        properties = build_properties_payload(deal, stages_map[deal["deal_stage"]["id"]])
+        if roll < missing_rate + changed_rate:
+            properties["Nome (Completar)"] = {"title": [{"text": {"content": deal["name"] + " (antigo)"}}]}
+        pages.append(properties)
+    return pages
@@ -0,0 +1,194 @@
+# --- BENCHMARK OFFLINE DA SINCRONIZAÇÃO RD -> NOTION ---
+"""
+Mede a sincronização completa e as funções principais contra um servidor falso local,
+sem acesso à rede. Exemplos:
+
+    python bench/run_bench.py                                   # 1k e 10k leads
+    python bench/run_bench.py --sizes 1000 10000 100000
+    python bench/run_bench.py --sizes 1000 --latency-ms 80 --rate-limit 0.05 --notion-rps 3
+    python bench/run_bench.py --json bench_output.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_api import FakeAPIState, start_fake_api
+from fixtures import generate_deals, generate_pages
+
+DATABASE_ID = "0" * 32
+NOTION_TYPES = {"text": "rich_text", "number": "number", "select": "select"}
+
+def configure_environment(base_url, state_dir, args):
+    """As configurações do rd_notion são lidas na importação, por isso têm de ser definidas antes."""
+    os.environ.update({
+        "NOTION_TOKEN": "bench", "NOTION_DATABASE_ID": DATABASE_ID, "RD_CRM_TOKEN": "bench",
+        "NOTION_API_BASE_URL": f"{base_url}/notion", "RD_API_BASE_URL": f"{base_url}/rd",
+        "BOTCONVERSA_BASE_URL": f"{base_url}/botconversa", "BOTCONVERSA_API_KEY": "bench", "BOTCONVERSA_SUBSCRIBER_ID": "1,2",
+        "BOTCONVERSA_REQUESTS_PER_SECOND": "1000",
+        "NOTION_REQUESTS_PER_SECOND": str(args.notion_rps), "NOTION_MAX_WORKERS": str(args.workers),
+        "SYNC_STATE_DIR": state_dir, "RUN_REPORT_FILE": "", "FORCE_FULL_RESCAN": "",
+    })
+
+def build_schema():
+    """Esquema da base falsa: as propriedades fixas mais as de NOTION_RD_MAP."""
+    from rd_notion.config import NOTION_RD_MAP
+    schema = {
+        "Nome (Completar)": {"id": "title", "type": "title"},
+        "Status": {"id": "stat", "type": "multi_select"},
+        "Telefone": {"id": "tel", "type": "phone_number"},
+    }
+    for info in NOTION_RD_MAP.values():
+        schema[info["notion_name"]] = {"id": info["notion_name"][:4], "type": NOTION_TYPES.get(info["notion_type"], info["notion_type"])}
+    return schema
+
+def time_calls(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    return {"calls": len(items), "seconds": round(elapsed, 6), "per_call_us": round(elapsed / max(1, len(items)) * 1e6, 3)}
+
+def run_quietly(func, *args):
+    """Executa func sem o output da sincronização; devolve (resultado, segundos)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+def verify_notion_state(fake_state, deals):
+    """Confere que cada negociação tem exatamente uma página ativa (não arquivada), com nome e telefone corretos."""
+    from rd_notion.leads import _get_simple_value_from_prop, get_lead_phone, normalize_phone_number
+    pages_by_rd_id = {}
+    live_pages = [page for page in fake_state.pages.values() if not page["archived"]]
+    for page in live_pages:
+        rd_id = _get_simple_value_from_prop(page["properties"].get("ID (RD Station)"))
+        pages_by_rd_id.setdefault(rd_id, []).append(page)
+    missing = duplicated = mismatched = 0
+    for deal in deals:
+        pages = pages_by_rd_id.get(deal["id"], [])
+        if not pages: missing += 1; continue
+        if len(pages) > 1: duplicated += 1
+        props = pages[0]["properties"]
+        expected_phone = normalize_phone_number(get_lead_phone(deal))
+        if (_get_simple_value_from_prop(props.get("Nome (Completar)")) != deal["name"]
+                or _get_simple_value_from_prop(props.get("Telefone")) != expected_phone):
+            mismatched += 1
+    return {"ok": not (missing or duplicated or mismatched), "pages": len(live_pages),
+            "missing": missing, "duplicated": duplicated, "mismatched": mismatched}
+
+def sync_result(fake_state, seconds):
+    from rd_notion.metrics import metrics
+    report = metrics.report()
+    return {
+        "seconds": round(seconds, 3),
+        "requests": dict(sorted(fake_state.requests.items())),
+        "retries": sum(stats["retries"] for stats in report["http"].values()),
+        "counters": report["counters"],
+        "phases_seconds": {name: round(value, 3) for name, value in report["phases_seconds"].items()},
+    }
+
+def bench_size(size, args, fake_state, state_dir):
+    from rd_notion.config import NOTION_RD_MAP, RD_STAGES_MAP as stages
+    from rd_notion.leads import build_properties_payload, get_lead_phone, normalize_phone_number, normalize_phone_numbers
+    from rd_notion.metrics import metrics
+    from rd_notion.notion import get_existing_notion_leads, update_lead_in_notion
+    from rd_notion.sync import run_sync
+
+    deals = generate_deals(size, list(stages), NOTION_RD_MAP, seed=args.seed)
+    pages = generate_pages(deals, stages, build_properties_payload, seed=args.seed,
+                           changed_rate=args.changed_rate, missing_rate=args.missing_rate)
+    result = {"leads": size, "notion_pages": len(pages)}
+
+    # Funções isoladas
+    phones = [get_lead_phone(deal) for deal in deals]
+    normalize_phone_number.cache_clear() # Mede a normalização a frio, sem a cache
+    result["normalize_phone_number"] = time_calls(normalize_phone_number, phones)
+    normalize_phone_number.cache_clear()
+    _, seconds = run_quietly(normalize_phone_numbers, phones)
+    result["normalize_phone_numbers"] = {"calls": len(phones), "seconds": round(seconds, 6), "per_call_us": round(seconds / max(1, len(phones)) * 1e6, 3)}
+    result["build_properties_payload"] = time_calls(lambda deal: build_properties_payload(deal, stages[deal["deal_stage"]["id"]]), deals)
+
+    # Fluxo completo: primeira execução (sem estado local) e segunda (snapshot e impressões digitais quentes)
+    fake_state.load(deals, pages)
+    shutil.rmtree(state_dir, ignore_errors=True)
+    os.makedirs(state_dir)
+    for run in ("cold", "warm"):
+        fake_state.requests = {}
+        metrics.reset()
+        _, seconds = run_quietly(run_sync)
+        result[f"sync_{run}"] = sync_result(fake_state, seconds)
+        result[f"sync_{run}"]["correctness"] = verify_notion_state(fake_state, deals)
+
+    # Comparação + escrita de uma atualização (amostra), contra o servidor falso
+    lead_index, _ = run_quietly(get_existing_notion_leads)
+    sample = [(lead_index.get("rd_id", deal["id"]), deal) for deal in deals[:args.update_sample]]
+    sample = [(entry, deal) for entry, deal in sample if entry]
+    _, seconds = run_quietly(lambda: [update_lead_in_notion(entry, deal, stages[deal["deal_stage"]["id"]]) for entry, deal in sample])
+    result["update_lead_in_notion"] = {"calls": len(sample), "seconds": round(seconds, 6),
+                                       "per_call_us": round(seconds / max(1, len(sample)) * 1e6, 3)}
+    return result
+
+def print_result(result):
+    print(f"\n=== {result['leads']} leads ({result['notion_pages']} páginas no Notion) ===")
+    for name in ("normalize_phone_number", "normalize_phone_numbers", "build_properties_payload", "update_lead_in_notion"):
+        stats = result[name]
+        print(f"  {name:<28} {stats['calls']:>8} chamadas  {stats['seconds']:>10.4f}s  {stats['per_call_us']:>10.2f} µs/chamada")
+    for run in ("cold", "warm"):
+        stats = result[f"sync_{run}"]
+        correctness = "OK" if stats["correctness"]["ok"] else f"FALHOU {stats['correctness']}"
+        requests_total = sum(stats["requests"].values())
+        print(f"  sync ({run:<4})                  {stats['seconds']:>10.3f}s  {requests_total:>7} pedidos  {stats['retries']:>5} retries  verificação: {correctness}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline da sincronização RD -> Notion.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Número de leads por cenário (ex: 1000 10000 100000).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência adicionada a cada pedido ao servidor falso.")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fração dos pedidos ao Notion respondidos com 429.")
+    parser.add_argument("--retry-after", type=int, default=0, help="Valor do Retry-After nas respostas 429.")
+    parser.add_argument("--drop-create-rate", type=float, default=0.0, help="Fração das criações de páginas cuja resposta se perde.")
+    parser.add_argument("--notion-rps", type=float, default=1000.0, help="Limite de pedidos/s ao Notion usado pelo sync.")
+    parser.add_argument("--workers", type=int, default=4, help="NOTION_MAX_WORKERS usado pelo sync.")
+    parser.add_argument("--changed-rate", type=float, default=0.1, help="Fração das páginas com dados desatualizados.")
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="Fração das negociações sem página no Notion.")
+    parser.add_argument("--update-sample", type=int, default=200, help="Número de atualizações medidas isoladamente.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Grava os resultados neste ficheiro JSON.")
+    args = parser.parse_args(argv)
+
+    state_dir = tempfile.mkdtemp(prefix="rd_notion_bench_")
+    fake_state = FakeAPIState(DATABASE_ID, schema={}, latency=args.latency_ms / 1000.0,
+                              rate_limit_rate=args.rate_limit, retry_after=args.retry_after, seed=args.seed,
+                              drop_create_rate=args.drop_create_rate)
+    server, base_url = start_fake_api(fake_state)
+    configure_environment(base_url, state_dir, args)
+    sys.path.insert(0, REPO_DIR)
+    fake_state.schema = build_schema()
+
+    results = []
+    try:
+        for size in args.sizes:
+            result = bench_size(size, args, fake_state, state_dir)
+            print_result(result)
+            results.append(result)
+    finally:
+        server.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em '{args.json}'.")
+    return 0 if all(r[f"sync_{run}"]["correctness"]["ok"] for r in results for run in ("cold", "warm")) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
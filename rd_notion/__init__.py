@@ -0,0 +1 @@
+"""Sincronização de negociações do RD Station com uma base de dados do Notion."""
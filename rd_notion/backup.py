@@ -0,0 +1,180 @@
+"""Backup da base do Notion para o Google Drive. As bibliotecas da Google só são importadas no upload."""
+import csv
+import datetime
+import gzip
+import json
+import os
+import shutil
+
+import requests
+
+from .config import (
+    BACKUP_FULL_INTERVAL_HOURS, BACKUP_LOCAL_DIR, BACKUP_LOCAL_ONLY, BACKUP_MODE, BACKUP_STATE_FILE, GDRIVE_CREDENTIALS_JSON,
+    GDRIVE_FOLDER_ID, GDRIVE_TOKEN_JSON, GDRIVE_UPLOAD_CHUNK_SIZE, GDRIVE_UPLOAD_RETRIES, NOTION_DATABASE_ID,
+    SYNC_STATE_DIR,
+)
+from .metrics import timed
+from .notion import get_notion_database_properties, iter_database_pages, query_page_ids
+
+# --- FUNÇÕES DE BACKUP E UPLOAD ---
+def upload_to_google_drive(filename):
+    """Carrega o ficheiro para a pasta GDRIVE_FOLDER_ID. Devolve True se o upload terminou."""
+    print(f"--- A iniciar o upload do backup para o Google Drive: '{filename}' ---")
+    try:
+        # Importadas só aqui: a sincronização normal não precisa do cliente da Google
+        import google.oauth2.credentials
+        from googleapiclient.discovery import build
+        from googleapiclient.http import MediaFileUpload
+    except ImportError as e:
+        print(f"### ERRO: Bibliotecas do Google Drive não instaladas (pip install -r requirements.txt): {e} ###"); return False
+    try:
+        if not GDRIVE_CREDENTIALS_JSON or not GDRIVE_TOKEN_JSON:
+            print("### ERRO: Credenciais ou token do Google Drive não encontrados. Verifique os GitHub Secrets. ###"); return False
+        creds_info = json.loads(GDRIVE_CREDENTIALS_JSON)
+        token_info = json.loads(GDRIVE_TOKEN_JSON)
+        creds = google.oauth2.credentials.Credentials.from_authorized_user_info(token_info, scopes=["https://www.googleapis.com/auth/drive"])
+        service = build('drive', 'v3', credentials=creds)
+        file_metadata = {'name': filename, 'parents': [GDRIVE_FOLDER_ID]}
+        # Upload resumível em blocos: uma falha de ligação só repete o bloco atual
+        media = MediaFileUpload(filename, mimetype='application/gzip', chunksize=GDRIVE_UPLOAD_CHUNK_SIZE, resumable=True)
+        request = service.files().create(body=file_metadata, media_body=media, fields='id')
+        file = None
+        while file is None:
+            status, file = request.next_chunk(num_retries=GDRIVE_UPLOAD_RETRIES)
+            if status: print(f"   -> Upload em curso: {int(status.progress() * 100)}%")
+        print(f"✔ Backup carregado com sucesso para o Google Drive! ID do ficheiro: {file.get('id')}")
+        return True
+    except Exception as e:
+        print(f"### ERRO AO FAZER UPLOAD DO BACKUP PARA O GOOGLE DRIVE: {e} ###")
+        return False
+
+def extract_backup_property_value(prop):
+    prop_type = prop.get('type')
+    if not prop_type: return ""
+    if prop_type in ['title', 'rich_text']:
+        return prop[prop_type][0]['text']['content'] if prop.get(prop_type) and prop[prop_type] else ""
+    elif prop_type == 'number': return prop['number']
+    elif prop_type == 'select': return prop['select']['name'] if prop.get('select') else ""
+    elif prop_type == 'multi_select': return ", ".join([item['name'] for item in prop['multi_select']])
+    elif prop_type == 'date': return prop['date']['start'] if prop.get('date') else ""
+    elif prop_type == 'phone_number': return prop['phone_number']
+    return "N/A"
+
+# --- BACKUP COMPLETO E INCREMENTAL ---
+# Colunas de controlo de cada linha: página, última edição e operação ("upsert" ou "delete", só nos deltas)
+BACKUP_META_COLUMNS = ["_page_id", "_last_edited_time", "_op"]
+BACKUP_TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+def load_backup_state():
+    if not os.path.exists(BACKUP_STATE_FILE): return None
+    try:
+        with open(BACKUP_STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"!! Aviso: Estado do backup ilegível, será gerada uma base completa: {e}")
+        return None
+
+def save_backup_state(state):
+    os.makedirs(SYNC_STATE_DIR, exist_ok=True)
+    tmp_filename = BACKUP_STATE_FILE + ".tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp_filename, BACKUP_STATE_FILE)
+
+def backup_row(page, op="upsert"):
+    row = {prop_name: extract_backup_property_value(prop_data) for prop_name, prop_data in page.get('properties', {}).items()}
+    row.update({"_page_id": page["id"], "_last_edited_time": page.get("last_edited_time", ""), "_op": op})
+    return row
+
+def _needs_new_base(state, header_list, now):
+    """Uma base nova é gerada no modo full, sem estado, noutra base de dados, se o esquema mudou ou se a base é antiga."""
+    if BACKUP_MODE == "full" or not state: return True
+    if state.get("database_id") != NOTION_DATABASE_ID or state.get("header") != header_list: return True
+    base_taken_at = datetime.datetime.strptime(state["base_timestamp"], BACKUP_TIMESTAMP_FORMAT)
+    return (now - base_taken_at).total_seconds() >= BACKUP_FULL_INTERVAL_HOURS * 3600
+
+def _store_backup_file(filename):
+    """
+    Carrega o ficheiro para o Drive e guarda uma cópia local, se BACKUP_LOCAL_DIR estiver definido.
+    Devolve True só se o upload correu bem: a cópia local não esconde uma falha no Drive (exceto com BACKUP_LOCAL_ONLY).
+    """
+    if BACKUP_LOCAL_ONLY and not BACKUP_LOCAL_DIR:
+        print("### ERRO: BACKUP_LOCAL_ONLY requer BACKUP_LOCAL_DIR. Backup não guardado. ###"); return False
+    uploaded = BACKUP_LOCAL_ONLY or upload_to_google_drive(filename)
+    if BACKUP_LOCAL_DIR:
+        os.makedirs(BACKUP_LOCAL_DIR, exist_ok=True)
+        shutil.copy(filename, os.path.join(BACKUP_LOCAL_DIR, os.path.basename(filename)))
+        print(f"Cópia local guardada em '{BACKUP_LOCAL_DIR}'.")
+    return uploaded
+
+@timed("backup_notion_database")
+def backup_notion_database(force_full=False):
+    """
+    Gera um CSV comprimido (gzip) da base do Notion em streaming, com as colunas tiradas do esquema da base.
+    No modo incremental, entre bases completas periódicas só são gravadas as páginas criadas ou editadas
+    desde o último backup (last_edited_time) e as arquivadas, detetadas por uma leitura só dos IDs.
+    Cada base e os seus deltas permitem reconstruir a base em qualquer momento (ver restore.py).
+    """
+    print("--- A iniciar o backup da base de dados do Notion ---")
+    database_properties = get_notion_database_properties()
+    if database_properties is None:
+        print("### ERRO AO BUSCAR O ESQUEMA DO NOTION PARA BACKUP ###"); return
+    header_list = sorted(database_properties)
+    now = datetime.datetime.now()
+    timestamp = now.strftime(BACKUP_TIMESTAMP_FORMAT)
+    state = load_backup_state()
+    is_base = force_full or _needs_new_base(state, header_list, now)
+    filename = f"backup_notion_{'base' if is_base else 'delta'}_{timestamp}.csv.gz"
+    total_rows = 0
+    try:
+        if is_base:
+            print("   -> Backup completo (nova base).")
+            pages = iter_database_pages()
+            deleted_ids, page_ids, high_water_mark = [], {}, None
+        else:
+            page_ids = query_page_ids()
+            deleted_ids = sorted(set(state["page_ids"]) - set(page_ids))
+            high_water_mark = state.get("high_water_mark")
+            print(f"   -> Backup incremental desde {high_water_mark}: {len(deleted_ids)} página(s) arquivada(s).")
+            # 'on_or_after' porque o Notion arredonda o last_edited_time ao minuto
+            query_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": high_water_mark}} if high_water_mark else None
+            pages = iter_database_pages(query_filter=query_filter)
+
+        with gzip.open(filename, 'wt', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=header_list + BACKUP_META_COLUMNS, delimiter=';', restval="", extrasaction='ignore')
+            writer.writeheader()
+            for page in pages:
+                writer.writerow(backup_row(page))
+                total_rows += 1
+                if is_base: page_ids[page["id"]] = page.get("last_edited_time")
+            for page_id in deleted_ids:
+                writer.writerow({"_page_id": page_id, "_op": "delete"})
+                total_rows += 1
+
+        edited_times = [edited for edited in page_ids.values() if edited]
+        new_state = {
+            "database_id": NOTION_DATABASE_ID,
+            "header": header_list,
+            "base_timestamp": timestamp if is_base else state["base_timestamp"],
+            "base_file": filename if is_base else state["base_file"],
+            "high_water_mark": max(edited_times + ([high_water_mark] if high_water_mark else []), default=None),
+            "page_ids": sorted(page_ids),
+            "deltas": [] if is_base else state.get("deltas", []),
+        }
+        if not total_rows:
+            if is_base: print("A base de dados do Notion está vazia. Backup não gerado."); return
+            print("Nenhuma página alterada desde o último backup. Delta não gerado.")
+            save_backup_state(new_state); return
+        print(f"Ficheiro de backup temporário '{filename}' criado com sucesso ({total_rows} linhas).")
+        # O estado só avança se o ficheiro foi guardado; senão o próximo delta volta a incluir estas alterações
+        if _store_backup_file(filename):
+            if not is_base: new_state["deltas"].append(filename)
+            save_backup_state(new_state)
+    except requests.exceptions.RequestException as e:
+        print(f"### ERRO AO BUSCAR DADOS DO NOTION PARA BACKUP: {e} ###")
+    except IOError as e:
+        print(f"### ERRO AO SALVAR O FICHEIRO DE BACKUP TEMPORÁRIO: {e} ###")
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)
+            print(f"Ficheiro temporário '{filename}' apagado.")
@@ -0,0 +1,50 @@
+"""Linha de comandos: sync (por omissão), backup, restore e serve. Cada subcomando só importa o que usa."""
+import argparse
+
+from .config import PIPELINES_CONFIG_PATH, SERVE_HOST, SERVE_PORT, validate_config
+from .metrics import metrics
+
+# --- FLUXO PRINCIPAL (MODO DE PRODUÇÃO) ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincronização de negociações do RD Station com o Notion.")
+    subparsers = parser.add_subparsers(dest="command")
+    sync_parser = subparsers.add_parser("sync", help="Sincronização completa (modo por omissão).")
+    sync_parser.add_argument("--dry-run", action="store_true", help="Só calcula e mostra o plano de alterações, sem escrever no Notion.")
+    sync_parser.add_argument("--plan-file", help="Ficheiro JSON onde gravar o plano do dry-run (por omissão em SYNC_STATE_DIR).")
+    sync_parser.add_argument("--pipeline", action="append", dest="pipelines", metavar="NOME",
+                             help="Só sincroniza este pipeline de PIPELINES_CONFIG_PATH (pode repetir-se).")
+    backup_parser = subparsers.add_parser("backup", help="Backup da base do Notion para o Google Drive (requer as bibliotecas da Google).")
+    backup_parser.add_argument("--full", action="store_true", help="Força uma base completa, mesmo no modo incremental.")
+    restore_parser = subparsers.add_parser("restore", help="Reconstrói um CSV da base a partir de uma base e dos seus deltas.")
+    restore_parser.add_argument("directory", help="Pasta com os ficheiros backup_notion_base_*/backup_notion_delta_*.")
+    restore_parser.add_argument("--at", help="Momento a reconstruir (AAAA-MM-DD_HH-MM-SS); por omissão, o mais recente.")
+    restore_parser.add_argument("--output", help="Ficheiro de saída (.csv ou .csv.gz).")
+    restore_parser.add_argument("--compact", action="store_true", help="Grava o resultado como uma nova base (com as colunas de controlo).")
+    serve_parser = subparsers.add_parser("serve", help="Servidor de webhooks do RD Station com reconciliação periódica.")
+    serve_parser.add_argument("--host", default=SERVE_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVE_PORT)
+    args = parser.parse_args(argv)
+    if args.command == "restore": # Trabalha só com ficheiros locais
+        from .restore import restore_backup
+        restore_backup(args.directory, at=args.at, output=args.output, compact=args.compact)
+        return
+    # Com um ficheiro de pipelines, o sync lê as bases de cada pipeline em vez de NOTION_DATABASE_ID
+    validate_config(require_database_id=not (args.command in (None, "sync") and PIPELINES_CONFIG_PATH))
+
+    if args.command == "serve":
+        from .server import run_server
+        run_server(args.host, args.port)
+    elif args.command == "backup":
+        from .backup import backup_notion_database
+        backup_notion_database(force_full=args.full)
+        metrics.write_reports()
+    else:
+        from .pipelines import load_pipelines
+        from .sync import run_sync
+        pipelines = load_pipelines(getattr(args, "pipelines", None))
+        if getattr(args, "plan_file", None) and len(pipelines) > 1:
+            parser.error("--plan-file só pode ser usado com um pipeline; com vários, cada plano fica na pasta do seu pipeline.")
+        try:
+            run_sync(dry_run=getattr(args, "dry_run", False), plan_file=getattr(args, "plan_file", None), pipelines=pipelines)
+        finally: # Uma execução incompleta (RDFetchError) também deixa as métricas
+            metrics.write_reports()
@@ -0,0 +1,101 @@
+"""Clientes HTTP partilhados: sessão e limitadores de taxa do Notion e pedidos com novas tentativas."""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from .config import NOTION_HEADERS, NOTION_HTTP_POOL_SIZE, NOTION_MAX_RETRIES, NOTION_REQUESTS_PER_SECOND, NOTION_TOKEN
+from .metrics import metrics, timed_request
+
+# --- CLIENTE HTTP DO NOTION (LIMITE DE TAXA E NOVAS TENTATIVAS) ---
+class TokenBucket:
+    """Limitador de taxa (token bucket) partilhado entre threads."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+# O limite do Notion é por integração: pipelines com o mesmo token partilham o limitador, tokens diferentes não
+_notion_rate_limiters = {}
+_notion_rate_limiters_lock = threading.Lock()
+
+def get_notion_rate_limiter(token=None):
+    """Devolve o limitador de taxa do token de integração (por omissão, NOTION_TOKEN)."""
+    token = token or NOTION_TOKEN
+    with _notion_rate_limiters_lock:
+        if token not in _notion_rate_limiters:
+            _notion_rate_limiters[token] = TokenBucket(NOTION_REQUESTS_PER_SECOND)
+        return _notion_rate_limiters[token]
+
+# Sessão partilhada (keep-alive) para todos os pedidos ao Notion, de qualquer base ou token
+notion_session = requests.Session()
+notion_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, NOTION_HTTP_POOL_SIZE)))
+notion_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, NOTION_HTTP_POOL_SIZE)))
+
+def _notion_headers(token):
+    if not token or token == NOTION_TOKEN: return NOTION_HEADERS
+    return dict(NOTION_HEADERS, Authorization=f"Bearer {token}")
+
+def _retry_delay(attempt, response=None):
+    """Tempo de espera antes da próxima tentativa: Retry-After se existir, senão backoff exponencial com jitter."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+    return random.uniform(0, min(30.0, 0.5 * (2 ** attempt)))
+
+def request_never_sent(error):
+    """True se a ligação falhou antes de o pedido chegar ao servidor (é seguro repeti-lo, mesmo que não seja idempotente)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout): return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+def notion_request(method, url, endpoint=None, token=None, idempotent=True, **kwargs):
+    """
+    Faz um pedido à API do Notion respeitando o limite de taxa do token (por omissão, NOTION_TOKEN).
+    Pedidos com 429 respeitam o Retry-After; erros 5xx e de ligação são repetidos com backoff.
+    Pedidos não idempotentes (idempotent=False, ex: criar uma página) só são repetidos se nunca foram processados
+    (429 ou falha ao ligar); um timeout de leitura, uma ligação cortada ou um 5xx podem ter deixado a escrita feita,
+    por isso o erro ou a resposta vão logo para quem chamou, que decide se pode repetir.
+    O endpoint (ex: "notion PATCH /pages/{id}") agrupa o pedido nas métricas.
+    """
+    kwargs.setdefault("timeout", 30)
+    endpoint = endpoint or f"notion {method}"
+    rate_limiter, headers = get_notion_rate_limiter(token), _notion_headers(token)
+    for attempt in range(NOTION_MAX_RETRIES + 1):
+        if attempt: metrics.record_retry(endpoint)
+        rate_limiter.acquire()
+        try:
+            response = timed_request(endpoint, notion_session.request, method, url, headers=headers, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == NOTION_MAX_RETRIES or not (idempotent or request_never_sent(e)): raise
+            delay = _retry_delay(attempt)
+            print(f"  !! Aviso: Falha de ligação ao Notion ({e}). Nova tentativa em {delay:.1f}s.")
+        else:
+            if response.status_code != 429 and response.status_code < 500: return response
+            if attempt == NOTION_MAX_RETRIES or (response.status_code != 429 and not idempotent): return response
+            delay = _retry_delay(attempt, response)
+            print(f"  !! Aviso: Notion respondeu {response.status_code}. Nova tentativa em {delay:.1f}s.")
+        time.sleep(delay)
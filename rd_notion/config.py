@@ -0,0 +1,200 @@
+"""Configurações lidas do ambiente e mapeamentos RD -> Notion. Não importa dependências externas."""
+import json
+import os
+import re
+
+# --- CONFIGURAÇÕES GERAIS ---
+NOTION_TOKEN = os.environ.get("NOTION_TOKEN", "").strip()
+# As URLs base podem ser apontadas para servidores locais de teste
+NOTION_API_BASE_URL = os.environ.get("NOTION_API_BASE_URL", "https://api.notion.com/v1").strip().rstrip("/")
+NOTION_DATABASE_ID = os.environ.get("NOTION_DATABASE_ID", "").replace("-", "").strip()
+RD_CRM_TOKEN = os.environ.get("RD_CRM_TOKEN", "").strip()
+RD_API_BASE_URL = os.environ.get("RD_API_BASE_URL", "https://crm.rdstation.com/api/v1").strip().rstrip("/")
+# O RD aceita no máximo 200 negociações por página
+RD_PAGE_SIZE = int(os.environ.get("RD_PAGE_SIZE", "200"))
+RD_MAX_WORKERS = int(os.environ.get("RD_MAX_WORKERS", "4"))
+RD_MAX_RETRIES = int(os.environ.get("RD_MAX_RETRIES", "5"))
+
+# --- CONFIGURAÇÕES DE CONCORRÊNCIA DO NOTION ---
+# O Notion aceita em média ~3 pedidos/segundo por integração
+NOTION_REQUESTS_PER_SECOND = float(os.environ.get("NOTION_REQUESTS_PER_SECOND", "3"))
+NOTION_MAX_WORKERS = int(os.environ.get("NOTION_MAX_WORKERS", "4"))
+NOTION_MAX_RETRIES = int(os.environ.get("NOTION_MAX_RETRIES", "5"))
+# Ligações ao Notion mantidas abertas (keep-alive); com vários pipelines, os workers de todos escrevem em paralelo
+NOTION_HTTP_POOL_SIZE = int(os.environ.get("NOTION_HTTP_POOL_SIZE", "16"))
+
+# --- CONFIGURAÇÕES DO WHATSAPP ---
+BOTCONVERSA_API_KEY = os.environ.get("BOTCONVERSA_API_KEY", "").strip()
+
+# aceita um EXTRA opcional e remove duplicados
+_base = os.environ.get("BOTCONVERSA_SUBSCRIBER_ID", "").strip()
+_extra = os.environ.get("BOTCONVERSA_SUBSCRIBER_ID_EXTRA", "").strip()
+_ids = [x.strip() for x in (_base + ("," if _base and _extra else "") + _extra).split(",") if x.strip()]
+BOTCONVERSA_SUBSCRIBER_ID = ",".join(dict.fromkeys(_ids))  # preserva ordem, sem duplicar
+
+BOTCONVERSA_BASE_URL = os.environ.get("BOTCONVERSA_BASE_URL", "https://backend.botconversa.com.br").strip().rstrip("/")
+# Mensagens maiores são divididas em várias partes, sempre entre blocos/linhas
+BOTCONVERSA_MAX_MESSAGE_LENGTH = int(os.environ.get("BOTCONVERSA_MAX_MESSAGE_LENGTH", "4000"))
+BOTCONVERSA_REQUESTS_PER_SECOND = float(os.environ.get("BOTCONVERSA_REQUESTS_PER_SECOND", "2"))
+BOTCONVERSA_MAX_WORKERS = int(os.environ.get("BOTCONVERSA_MAX_WORKERS", "4"))
+
+
+# --- CONFIGURAÇÕES DO MODO SERVIDOR (WEBHOOKS DO RD STATION) ---
+SERVE_HOST = os.environ.get("SERVE_HOST", "0.0.0.0").strip()
+SERVE_PORT = int(os.environ.get("PORT", "8080"))
+# Se definido, o RD tem de enviar ?token=... (ou o cabeçalho X-Webhook-Token) em cada webhook
+RD_WEBHOOK_TOKEN = os.environ.get("RD_WEBHOOK_TOKEN", "").strip()
+# Reconciliação completa periódica, como rede de segurança para webhooks perdidos
+SERVE_RECONCILE_INTERVAL_MINUTES = float(os.environ.get("SERVE_RECONCILE_INTERVAL_MINUTES", "360"))
+# Leitura incremental periódica do Notion, para o índice em memória ver as edições feitas à mão no Notion
+# (as escritas do próprio servidor atualizam o índice diretamente)
+SERVE_INDEX_REFRESH_INTERVAL_MINUTES = float(os.environ.get("SERVE_INDEX_REFRESH_INTERVAL_MINUTES", "10"))
+# Intervalo de envio do resumo agrupado das alterações feitas via webhook
+SERVE_NOTIFY_INTERVAL_MINUTES = float(os.environ.get("SERVE_NOTIFY_INTERVAL_MINUTES", "15"))
+
+# --- CONFIGURAÇÕES DO GOOGLE DRIVE ---
+GDRIVE_FOLDER_ID = os.environ.get("GDRIVE_FOLDER_ID", "").strip()
+GDRIVE_CREDENTIALS_JSON = os.environ.get("GDRIVE_CREDENTIALS_JSON", "").strip()
+GDRIVE_TOKEN_JSON = os.environ.get("GDRIVE_TOKEN_JSON", "").strip()
+# O tamanho de cada bloco do upload resumível tem de ser múltiplo de 256 KB
+GDRIVE_UPLOAD_CHUNK_SIZE = int(os.environ.get("GDRIVE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+GDRIVE_UPLOAD_RETRIES = int(os.environ.get("GDRIVE_UPLOAD_RETRIES", "5"))
+
+# --- CONFIGURAÇÕES DO BACKUP ---
+# "incremental": uma base completa periódica e, entre bases, só as páginas criadas/editadas/arquivadas (deltas).
+# "full": um CSV completo em cada execução, como antes.
+BACKUP_MODE = os.environ.get("BACKUP_MODE", "incremental").strip().lower() or "incremental"
+# Idade máxima da base antes de ser gerada uma nova (por omissão, semanal)
+BACKUP_FULL_INTERVAL_HOURS = float(os.environ.get("BACKUP_FULL_INTERVAL_HOURS", "168"))
+# Se definido, os ficheiros de backup também ficam guardados nesta pasta (em vez de apagados após o upload)
+BACKUP_LOCAL_DIR = os.environ.get("BACKUP_LOCAL_DIR", "").strip()
+# Só guarda os backups em BACKUP_LOCAL_DIR, sem upload para o Google Drive (ex: BACKUP_LOCAL_ONLY=1)
+BACKUP_LOCAL_ONLY = os.environ.get("BACKUP_LOCAL_ONLY", "").strip().lower() in ("1", "true", "sim", "yes")
+
+# --- CONFIGURAÇÕES DO ESTADO LOCAL (SNAPSHOT DO NOTION) ---
+SYNC_STATE_DIR = os.environ.get("SYNC_STATE_DIR", ".sync_state").strip() or ".sync_state"
+NOTION_SNAPSHOT_FILE = os.path.join(SYNC_STATE_DIR, "notion_snapshot.json")
+# Força uma releitura completa da base do Notion e ignora as impressões digitais (ex: FORCE_FULL_RESCAN=1)
+FORCE_FULL_RESCAN = os.environ.get("FORCE_FULL_RESCAN", "").strip().lower() in ("1", "true", "sim", "yes")
+# Intervalo entre leituras só dos IDs, que retiram do snapshot as páginas arquivadas/apagadas (0 = em todas as execuções).
+# Entre leituras, uma atualização recusada por a página estar arquivada passa a criação (ver apply_operation).
+NOTION_ID_SWEEP_INTERVAL_HOURS = float(os.environ.get("NOTION_ID_SWEEP_INTERVAL_HOURS", "24"))
+DEAL_FINGERPRINTS_FILE = os.path.join(SYNC_STATE_DIR, "deal_fingerprints.json")
+# Relatório da execução em JSON (tempos, pedidos HTTP, latências); o formato Prometheus é opcional
+RUN_REPORT_FILE = os.environ.get("RUN_REPORT_FILE", os.path.join(SYNC_STATE_DIR, "run_report.json")).strip()
+RUN_REPORT_PROMETHEUS_FILE = os.environ.get("RUN_REPORT_PROMETHEUS_FILE", "").strip()
+# Estado do backup incremental (base atual, marca de last_edited_time e IDs das páginas conhecidas)
+BACKUP_STATE_FILE = os.path.join(SYNC_STATE_DIR, "backup_state.json")
+# Diário das operações aplicadas, para retomar uma execução interrompida
+SYNC_JOURNAL_FILE = os.path.join(SYNC_STATE_DIR, "sync_journal.jsonl")
+# Plano gravado por 'sync --dry-run' (JSON com todas as operações)
+SYNC_PLAN_FILE = os.path.join(SYNC_STATE_DIR, "sync_plan.json")
+# As operações do plano são aplicadas em lotes deste tamanho
+SYNC_WRITE_BATCH_SIZE = int(os.environ.get("SYNC_WRITE_BATCH_SIZE", "100"))
+# Incrementar sempre que o formato do snapshot mudar, para invalidar os snapshots antigos
+SNAPSHOT_FORMAT_VERSION = 3
+
+# --- MAPEAMENTOS ---
+RD_STAGES_MAP = {
+    "67ae261cab5a8e00178ea863": "Avaliando",
+    "67bcd1b67d60d4001b8c8aa2": "Condicionado",
+    "67ae261cab5a8e00178ea864": "Aprovado",
+    "67ae261cab5a8e00178ea865": "Com Reserva",
+}
+
+NOTION_RD_MAP = {
+    "67ea8afafddd15001447f639": {"notion_name": "ID (RD Station)", "notion_type": "text"},
+    "67b62f4fad0a4e0014841510": {"notion_name": "De onde é?", "notion_type": "text"},
+    "67b31f6fcbd9da00143b9e4e": {"notion_name": "Aluguel", "notion_type": "number"},
+    "67bdbe2a5062a6001945f18b": {"notion_name": "Por que deseja a casa?", "notion_type": "text"},
+    "67b31ac9fce8b4001e8dca11": {"notion_name": "Recebe Bolsa Família?", "notion_type": "select"},
+    "67b0a3f6b436410018d97957": {"notion_name": "Profissão", "notion_type": "text"},
+    "67b31e93786c3f00143b07ce": {"notion_name": "Idade", "notion_type": "number"},
+    "67b321ba30fafb001c8f8743": {"notion_name": "Estado Civil", "notion_type": "text"},
+    "67b5d8552b873a001c9cca66": {"notion_name": "Dependente", "notion_type": "select"},
+    "67b31f37ca237d001e358c1b": {"notion_name": "+3 anos CLT", "notion_type": "select"},
+    "680cadbefcff56001b6be1a8": {"notion_name": "CPF (COMPRADOR)", "notion_type": "text"},
+    "67c9dfefcbf7520014b42750": {"notion_name": "Faixa de Valor da Dívida", "notion_type": "select"},
+    "689b40f4249be2001b75ca0c": {"notion_name": "Gênero", "notion_type": "select"},
+    "689b4185efda16001986bcfb": {"notion_name": "Local de Trabalho", "notion_type": "text"},
+    "689ceff78b78010021d0c5c5": {"notion_name": "Prestação Máxima", "notion_type": "number"},
+    "689cf00a43244c00142f8783": {"notion_name": "Parcela Aprovada", "notion_type": "number"},
+    "689cf024a5042d0014cd3b3e": {"notion_name": "Entrada Aprovada", "notion_type": "text"},
+    "689cf0370f0eb500193694da": {"notion_name": "Saldo FGTS", "notion_type": "text"},
+    "689cf0578c1400001473b22e": {"notion_name": "Subsídio Real", "notion_type": "number"},
+    "689cf22fb742ff0014c8ba3b": {"notion_name": "OBS: entrada? FGTS? FGTS Futuro? Limite Cartão?", "notion_type": "text"},
+}
+
+# Mapeamento alternativo num ficheiro JSON, no mesmo formato de NOTION_RD_MAP:
+#   {"<id do campo no RD>": {"notion_name": "...", "notion_type": "text|number|select|multi_select|date|checkbox|email|url"}}
+# Permite acrescentar campos personalizados do RD sem alterar o código.
+FIELD_MAP_PATH = os.environ.get("FIELD_MAP_PATH", "").strip()
+
+def load_field_map(path):
+    """Lê um mapeamento RD -> Notion de um ficheiro JSON. Os tipos são validados ao compilar (fields.py)."""
+    with open(path, encoding="utf-8") as f:
+        field_map = json.load(f)
+    if not isinstance(field_map, dict):
+        raise ValueError(f"Mapeamento de campos inválido em '{path}': esperado um objeto JSON.")
+    for rd_field_id, info in field_map.items():
+        if not isinstance(info, dict) or not info.get("notion_name") or not info.get("notion_type"):
+            raise ValueError(f"Mapeamento de campos inválido em '{path}': o campo '{rd_field_id}' precisa de notion_name e notion_type.")
+    return field_map
+
+if FIELD_MAP_PATH:
+    NOTION_RD_MAP = load_field_map(FIELD_MAP_PATH)
+
+# --- VÁRIOS FUNIS NO MESMO PROCESSO (PIPELINES) ---
+# Ficheiro JSON com os pares (etapas do RD -> base do Notion) a sincronizar numa só execução:
+#   {"pipelines": [{"name": "casas", "notion_database_id": "...", "stages": {"<id da etapa no RD>": "<Status no Notion>"},
+#                   "notion_token_env": "NOTION_TOKEN_CASAS"}]}
+# notion_token_env (opcional) é o nome da variável de ambiente com o token da integração; por omissão, NOTION_TOKEN.
+# Todos os pipelines usam o mesmo mapeamento de campos. Sem ficheiro, há um único pipeline: NOTION_DATABASE_ID + RD_STAGES_MAP.
+PIPELINES_CONFIG_PATH = os.environ.get("PIPELINES_CONFIG_PATH", "").strip()
+
+def load_pipelines_config(path):
+    """Lê e valida a lista de pipelines de um ficheiro JSON. Devolve [{name, database_id, stages, notion_token}]."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("pipelines") if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Configuração de pipelines inválida em '{path}': esperada uma lista não vazia em 'pipelines'.")
+    pipelines, names = [], set()
+    for entry in entries:
+        name = str(entry.get("name") or "").strip() if isinstance(entry, dict) else ""
+        if not re.match(r'^[\w-]+$', name) or name in names:
+            raise ValueError(f"Configuração de pipelines inválida em '{path}': nome '{name}' vazio, repetido ou com caracteres inválidos.")
+        names.add(name)
+        database_id = str(entry.get("notion_database_id") or "").replace("-", "").strip()
+        if len(database_id) != 32:
+            raise ValueError(f"Pipeline '{name}': notion_database_id inválido: '{database_id}'")
+        stages = entry.get("stages")
+        if not isinstance(stages, dict) or not stages:
+            raise ValueError(f"Pipeline '{name}': 'stages' tem de ser um objeto {{id da etapa no RD: Status no Notion}}.")
+        token_env = str(entry.get("notion_token_env") or "NOTION_TOKEN").strip()
+        notion_token = os.environ.get(token_env, "").strip()
+        if not notion_token:
+            raise ValueError(f"Pipeline '{name}': variável de ambiente '{token_env}' (token do Notion) não definida.")
+        pipelines.append({"name": name, "database_id": database_id, "stages": stages, "notion_token": notion_token})
+    return pipelines
+
+# Propriedades do Notion usadas como chaves de correspondência
+NOTION_RD_ID_PROPERTY = "ID (RD Station)"
+NOTION_PHONE_PROPERTY = "Telefone"
+NOTION_CPF_PROPERTY = "CPF (COMPRADOR)"
+# Só estas propriedades são guardadas no índice/snapshot (as que a atualização compara)
+INDEXED_PROPERTIES = frozenset(["Nome (Completar)", "Status", NOTION_PHONE_PROPERTY] + [info["notion_name"] for info in NOTION_RD_MAP.values()])
+
+NOTION_HEADERS = {
+    "Authorization": f"Bearer {NOTION_TOKEN}",
+    "Content-Type": "application/json",
+    "Notion-Version": "2022-06-28",
+}
+
+def validate_config(require_database_id=True):
+    """
+    Valida a configuração obrigatória. Chamada pelos subcomandos, não na importação.
+    Com um ficheiro de pipelines, o sync não precisa de NOTION_DATABASE_ID (cada pipeline tem a sua base).
+    """
+    if require_database_id and len(NOTION_DATABASE_ID) != 32:
+        raise ValueError(f"NOTION_DATABASE_ID inválido: '{NOTION_DATABASE_ID}'")
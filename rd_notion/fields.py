@@ -0,0 +1,139 @@
+"""Conversão dos campos personalizados do RD em propriedades do Notion, compilada uma vez por mapeamento."""
+import datetime
+import hashlib
+import json
+import re
+
+from .config import NOTION_RD_MAP
+
+# --- CONVERSORES POR TIPO DO NOTION ---
+# Cada conversor recebe um valor não vazio do RD e devolve a propriedade no formato da API do Notion,
+# ou levanta ValueError/TypeError se o valor não servir para o tipo.
+_NUMBER_JUNK_RE = re.compile(r'[^\d.]')
+_ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[T ][\d:.]+(?:Z|[+-]\d{2}:?\d{2})?)?$')
+_BR_DATE_RE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+_MULTI_SELECT_SEPARATOR_RE = re.compile(r'\s*[,;]\s*')
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_URL_RE = re.compile(r'^https?://\S+$', re.IGNORECASE)
+_BARE_DOMAIN_RE = re.compile(r'^[\w-]+(?:\.[\w-]+)+(?:/\S*)?$')
+_CHECKBOX_TRUE = frozenset(["sim", "s", "true", "1", "yes", "x", "verdadeiro"])
+_CHECKBOX_FALSE = frozenset(["não", "nao", "n", "false", "0", "no", "falso"])
+
+def _convert_text(value):
+    return {"rich_text": [{"text": {"content": str(value)}}]}
+
+def _convert_number(value):
+    if isinstance(value, bool): raise TypeError("booleano não é um número")
+    if isinstance(value, (int, float)): return {"number": float(value)}
+    # Formato do RD: 'R$ 1.234,56'
+    cleaned_value = _NUMBER_JUNK_RE.sub('', str(value).replace("R$", "").strip().replace(".", "").replace(",", "."))
+    return {"number": float(cleaned_value)} if cleaned_value else None
+
+def _convert_select(value):
+    return {"select": {"name": str(value).strip()}}
+
+def _convert_multi_select(value):
+    items = value if isinstance(value, (list, tuple)) else _MULTI_SELECT_SEPARATOR_RE.split(str(value).strip())
+    names = list(dict.fromkeys(str(item).strip() for item in items if str(item).strip()))
+    return {"multi_select": [{"name": name} for name in names]} if names else None
+
+def _convert_date(value):
+    s_value = str(value).strip()
+    if _ISO_DATE_RE.match(s_value): return {"date": {"start": s_value}}
+    match = _BR_DATE_RE.match(s_value)
+    if not match: raise ValueError("data fora dos formatos AAAA-MM-DD ou DD/MM/AAAA")
+    day, month, year = (int(part) for part in match.groups())
+    return {"date": {"start": datetime.date(year, month, day).isoformat()}}
+
+def _convert_checkbox(value):
+    if isinstance(value, bool): return {"checkbox": value}
+    s_value = str(value).strip().lower()
+    if s_value in _CHECKBOX_TRUE: return {"checkbox": True}
+    if s_value in _CHECKBOX_FALSE: return {"checkbox": False}
+    raise ValueError("valor não reconhecido como sim/não")
+
+def _convert_email(value):
+    s_value = str(value).strip()
+    if not _EMAIL_RE.match(s_value): raise ValueError("e-mail inválido")
+    return {"email": s_value}
+
+def _convert_url(value):
+    s_value = str(value).strip()
+    if _URL_RE.match(s_value): return {"url": s_value}
+    if _BARE_DOMAIN_RE.match(s_value): return {"url": "https://" + s_value}
+    raise ValueError("URL inválida")
+
+CONVERTERS = {
+    "text": _convert_text,
+    "number": _convert_number,
+    "select": _convert_select,
+    "multi_select": _convert_multi_select,
+    "date": _convert_date,
+    "checkbox": _convert_checkbox,
+    "email": _convert_email,
+    "url": _convert_url,
+}
+
+# --- MAPEAMENTO COMPILADO ---
+class FieldMap:
+    """
+    Mapeamento RD -> Notion compilado: para cada ID de campo do RD, o nome da propriedade e o conversor.
+    Tipos desconhecidos e propriedades repetidas são rejeitados na compilação, não a meio da sincronização.
+    """
+
+    def __init__(self, field_map):
+        self.by_rd_id = {} # {id do campo no RD: (nome no Notion, tipo, conversor)}
+        self.rd_id_by_notion_name = {}
+        for rd_field_id, info in field_map.items():
+            notion_name, notion_type = info["notion_name"], info["notion_type"]
+            converter = CONVERTERS.get(notion_type)
+            if converter is None:
+                raise ValueError(f"Tipo '{notion_type}' do campo '{notion_name}' não suportado. Tipos aceites: {', '.join(CONVERTERS)}.")
+            if notion_name in self.rd_id_by_notion_name:
+                raise ValueError(f"A propriedade '{notion_name}' está mapeada para mais de um campo do RD.")
+            self.by_rd_id[rd_field_id] = (notion_name, notion_type, converter)
+            self.rd_id_by_notion_name[notion_name] = rd_field_id
+        # Muda sempre que o mapeamento muda; entra nas impressões digitais das negociações
+        material = sorted((rd_field_id, info["notion_name"], info["notion_type"]) for rd_field_id, info in field_map.items())
+        self.signature = hashlib.sha1(json.dumps(material, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self.by_rd_id)
+
+    def convert(self, custom_fields):
+        """
+        Converte a lista deal_custom_fields de uma negociação em {nome no Notion: propriedade}, numa só passagem.
+        Valores vazios são ignorados, para nunca substituir dados do Notion por vazio.
+        """
+        properties = {}
+        by_rd_id = self.by_rd_id
+        for field in custom_fields:
+            target = by_rd_id.get(field["custom_field"]["_id"])
+            if target is None: continue
+            value = field.get("value")
+            if value is None or (isinstance(value, str) and not value.strip()): continue
+            notion_name, notion_type, converter = target
+            try:
+                formatted_property = converter(value)
+            except (ValueError, TypeError) as e:
+                print(f"  !! Aviso: Não foi possível formatar o valor '{value}' para o tipo '{notion_type}'. Erro: {e}")
+                continue
+            if formatted_property:
+                properties[notion_name] = formatted_property
+        return properties
+
+    def convert_many(self, deals):
+        """Versão em lote de convert: devolve a lista de propriedades de cada negociação, pela mesma ordem."""
+        convert = self.convert
+        return [convert(deal.get("deal_custom_fields") or []) for deal in deals]
+
+    def get_value(self, lead_data, notion_name):
+        """Devolve o valor bruto do RD mapeado para a propriedade notion_name (ou None)."""
+        rd_field_id = self.rd_id_by_notion_name.get(notion_name)
+        if rd_field_id is None: return None
+        for field in lead_data.get("deal_custom_fields", []):
+            if field["custom_field"]["_id"] == rd_field_id:
+                return field.get("value")
+        return None
+
+FIELD_MAP = FieldMap(NOTION_RD_MAP)
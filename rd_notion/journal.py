@@ -0,0 +1,96 @@
+"""Diário (journal) das operações aplicadas numa execução, para retomar uma sincronização interrompida."""
+import datetime
+import json
+import os
+import threading
+import uuid
+
+from .config import NOTION_DATABASE_ID, SYNC_JOURNAL_FILE
+
+class SyncJournal:
+    """
+    Ficheiro JSON Lines com uma linha por operação aplicada (ID do RD, tipo, página, impressão digital, resultado).
+    Uma execução termina com uma linha "done". Se a última execução não chegou a essa linha, a seguinte retoma-a:
+    as operações já aplicadas com sucesso não são repetidas e os seus resumos entram no relatório final.
+    """
+
+    def __init__(self, filename=None, database_id=None):
+        self.filename = filename or SYNC_JOURNAL_FILE
+        self.database_id = database_id or NOTION_DATABASE_ID
+        self.run_id = None
+        self.resumed_run_id = None
+        self.completed = {} # {rd_id: registo} das operações bem-sucedidas da execução interrompida
+        self._lock = threading.Lock()
+        self._file = None
+
+    @property
+    def resumed(self):
+        return self.resumed_run_id is not None
+
+    def _read_interrupted_run(self):
+        """Lê o diário anterior; devolve (run_id, {rd_id: registo}) se a execução não terminou."""
+        if not os.path.exists(self.filename): return None, {}
+        run, completed = None, {}
+        try:
+            with open(self.filename, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue # Última linha cortada a meio por uma interrupção
+                    if record.get("type") == "run": run = record
+                    elif record.get("type") == "op" and record.get("ok"): completed[record["rd_id"]] = record
+                    elif record.get("type") == "done": run = None
+        except IOError as e:
+            print(f"!! Aviso: Não foi possível ler o diário da execução anterior: {e}")
+            return None, {}
+        if not run or run.get("database_id") != self.database_id: return None, {}
+        # Execuções retomadas continuam a acumular os registos da original
+        return run.get("resumes") or run["run_id"], completed
+
+    def open(self):
+        """Começa uma execução nova ou retoma a interrompida."""
+        self.resumed_run_id, self.completed = self._read_interrupted_run()
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        self.run_id = uuid.uuid4().hex
+        # Numa retoma o diário é mantido (append); caso contrário é recomeçado
+        self._file = open(self.filename, "a" if self.resumed else "w", encoding="utf-8")
+        self._write({"type": "run", "run_id": self.run_id, "resumes": self.resumed_run_id,
+                     "database_id": self.database_id, "started_at": _now_iso()})
+        self.checkpoint()
+        if self.resumed:
+            print(f"-> A retomar a execução interrompida {self.resumed_run_id}: {len(self.completed)} operação(ões) já aplicada(s).")
+        return self
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def record(self, operation, summary, fingerprint=None):
+        """Regista o resultado de uma operação (summary None = erro)."""
+        record = {
+            "type": "op", "rd_id": operation["rd_id"], "op": operation["op"], "name": operation["name"], "page_id": operation["page_id"],
+            "fingerprint": fingerprint, "last_edited_time": operation.get("last_edited_time"), "ok": summary is not None, "summary": summary,
+        }
+        with self._lock:
+            self._write(record)
+            self._file.flush()
+
+    def checkpoint(self):
+        """Garante que o que já foi registado está em disco."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def finish(self):
+        with self._lock:
+            self._write({"type": "done", "run_id": self.run_id, "finished_at": _now_iso()})
+        self.checkpoint()
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def _now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
@@ -0,0 +1,242 @@
+"""Formatação de propriedades, normalização de telefone/CPF e índice em memória dos leads do Notion."""
+import datetime
+import functools
+import re
+
+from .config import INDEXED_PROPERTIES, NOTION_CPF_PROPERTY, NOTION_PHONE_PROPERTY, NOTION_RD_ID_PROPERTY
+from .fields import FIELD_MAP
+
+# --- FORMATAÇÃO DE PROPRIEDADES E DADOS DAS NEGOCIAÇÕES ---
+def _get_simple_value_from_prop(prop_object):
+    """
+    Função auxiliar para extrair um valor simples de um objeto de propriedade do Notion.
+    Aceita o formato devolvido pela API ({"type": "rich_text", "rich_text": [...]}) e o formato
+    de pedido usado nos payloads ({"rich_text": [...]}), para que ambos possam ser comparados.
+    """
+    if not prop_object: return None
+    prop_type = prop_object.get('type') or next(iter(prop_object))
+    
+    # --- CORREÇÃO DO BUG ---
+    # Adicionamos verificações para garantir que o objeto da propriedade não é nulo
+    if prop_type in ['title', 'rich_text']:
+        prop_value = prop_object.get(prop_type)
+        if not prop_value: return None
+        # O Notion pode devolver o texto em vários segmentos
+        return "".join(item.get('plain_text') or item.get('text', {}).get('content', "") for item in prop_value)
+    elif prop_type == 'number':
+        return prop_object.get('number')
+    elif prop_type == 'select':
+        select_obj = prop_object.get('select')
+        return select_obj.get('name') if select_obj else None
+    elif prop_type == 'multi_select':
+        items = prop_object.get('multi_select') or []
+        return [item['name'] for item in items] if items else None
+    elif prop_type in ['phone_number', 'email', 'url', 'checkbox']:
+        return prop_object.get(prop_type)
+    elif prop_type == 'date':
+        date_obj = prop_object.get('date')
+        return date_obj.get('start') if date_obj else None
+    return None
+
+_ISO_DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T')
+
+def normalize_property_value(value):
+    """
+    Normaliza um valor simples (ver _get_simple_value_from_prop) para comparação, como o Notion o guarda:
+    números como float (o Notion devolve 1500 para 1500.0), texto sem espaços nas pontas,
+    datas com hora em UTC e listas de opções como tuplos. Vazios ficam None.
+    """
+    if value is None or isinstance(value, bool): return value
+    if isinstance(value, (int, float)): return float(value)
+    if isinstance(value, (list, tuple)): return tuple(str(item).strip() for item in value) or None
+    s_value = str(value).strip()
+    if not s_value: return None
+    if _ISO_DATETIME_RE.match(s_value):
+        try:
+            parsed = datetime.datetime.fromisoformat(s_value.replace("Z", "+00:00"))
+            if parsed.tzinfo: parsed = parsed.astimezone(datetime.timezone.utc)
+            return parsed.isoformat()
+        except ValueError:
+            pass
+    return s_value
+
+def get_lead_custom_field(lead_data, notion_name):
+    """Devolve o valor do campo personalizado do RD mapeado para a propriedade notion_name (ou None)."""
+    return FIELD_MAP.get_value(lead_data, notion_name)
+
+def get_lead_phone(lead_data):
+    """Devolve o primeiro telefone do primeiro contacto da negociação (ou "")."""
+    lead_phone = ""
+    if lead_data.get("contacts"):
+        phones = (lead_data["contacts"][0].get("phones") or [{}])
+        if phones: lead_phone = phones[0].get("phone")
+    return lead_phone
+
+def build_properties_payload(lead_data, situacao, custom_properties=None, normalized_phone=None):
+    """
+    Constrói o dicionário de propriedades para a API do Notion.
+    custom_properties e normalized_phone permitem reutilizar valores já calculados em lote (ver build_sync_plan).
+    """
+    # --- NOVA REGRA: NÃO SUBSTITUIR COM VAZIO ---
+    # O mapeamento compilado só converte os valores do RD que não são vazios.
+    if custom_properties is None:
+        custom_properties = FIELD_MAP.convert(lead_data.get("deal_custom_fields") or [])
+    properties = custom_properties
+    properties["Nome (Completar)"] = {"title": [{"text": {"content": lead_data.get("name", "Negociação sem nome")}}]}
+    properties["ID (RD Station)"] = {"rich_text": [{"text": {"content": lead_data["id"]}}]}
+    properties["Status"] = {"multi_select": [{"name": situacao}]}
+    lead_phone = get_lead_phone(lead_data)
+    if lead_phone and normalized_phone is None: normalized_phone = normalize_phone_number(lead_phone)
+    properties["Telefone"] = {"phone_number": normalized_phone if lead_phone else None}
+    return properties
+
+# --- ÍNDICE DE LEADS DO NOTION ---
+_NON_DIGITS_RE = re.compile(r'\D')
+
+def normalize_cpf(cpf_str):
+    """Mantém só os dígitos do CPF; devolve "" se não tiver 11 dígitos."""
+    only_digits = _NON_DIGITS_RE.sub('', str(cpf_str or ""))
+    return only_digits if len(only_digits) == 11 else ""
+
+def compact_notion_properties(properties):
+    """Reduz as propriedades de uma página do Notion aos valores simples das propriedades indexadas."""
+    values = {}
+    for prop_name, prop_object in properties.items():
+        if prop_name not in INDEXED_PROPERTIES: continue
+        value = _get_simple_value_from_prop(prop_object)
+        if value is not None: values[prop_name] = value
+    return values
+
+class LeadEntry:
+    """
+    Entrada compacta do índice: ID da página, last_edited_time, os valores simples comparados
+    e o telefone já normalizado (calculado uma vez, ou recebido da normalização em lote).
+    """
+    __slots__ = ("page_id", "last_edited_time", "values", "phone")
+
+    def __init__(self, page_id, last_edited_time, values, phone=None):
+        self.page_id = page_id
+        self.last_edited_time = last_edited_time
+        self.values = values
+        self.phone = normalize_phone_number(values.get(NOTION_PHONE_PROPERTY)) if phone is None else phone
+
+    @property
+    def rd_id(self):
+        return self.values.get(NOTION_RD_ID_PROPERTY)
+
+    @property
+    def cpf(self):
+        return normalize_cpf(self.values.get(NOTION_CPF_PROPERTY))
+
+class LeadIndex:
+    """
+    Índice em memória das páginas do Notion por ID do RD, telefone normalizado e CPF.
+    Quando duas páginas partilham a mesma chave, fica a editada mais recentemente e o duplicado é registado.
+    """
+    KEYS = ("rd_id", "phone", "cpf")
+
+    def __init__(self):
+        self.entries = {}
+        self.by_key = {key: {} for key in self.KEYS}
+        self.duplicates = {key: {} for key in self.KEYS} # {chave: {valor: [page_ids]}}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        self.entries[entry.page_id] = entry
+        for key in self.KEYS:
+            value = getattr(entry, key)
+            if not value: continue
+            current = self.by_key[key].get(value)
+            if current and current.page_id != entry.page_id:
+                page_ids = self.duplicates[key].setdefault(value, [current.page_id])
+                page_ids.append(entry.page_id)
+                if (current.last_edited_time or "") >= (entry.last_edited_time or ""): continue
+            self.by_key[key][value] = entry
+
+    def remove(self, page_id):
+        """Retira a página do índice; uma chave que ela partilhava passa para a duplicada editada mais recentemente."""
+        entry = self.entries.pop(page_id, None)
+        if entry is None: return None
+        for key in self.KEYS:
+            value = getattr(entry, key)
+            if not value: continue
+            page_ids = [other for other in self.duplicates[key].pop(value, []) if other != page_id]
+            if len(page_ids) > 1: self.duplicates[key][value] = page_ids
+            if self.by_key[key].get(value) is entry:
+                remaining = [self.entries[other] for other in page_ids if other in self.entries]
+                if remaining: self.by_key[key][value] = max(remaining, key=lambda other: other.last_edited_time or "")
+                else: del self.by_key[key][value]
+        return entry
+
+    def get(self, key, value):
+        return self.by_key[key].get(value) if value else None
+
+    def match_lead(self, lead_data, normalized_phone=None, cpf=None):
+        """
+        Procura a página de uma negociação por ID do RD, depois telefone, depois CPF.
+        Devolve (entrada ou None, lista de conflitos), onde um conflito é uma chave que aponta para outra página.
+        """
+        if normalized_phone is None:
+            normalized_phone = normalize_phone_number(get_lead_phone(lead_data))
+        if cpf is None:
+            cpf = normalize_cpf(get_lead_custom_field(lead_data, NOTION_CPF_PROPERTY))
+        candidates = [("rd_id", lead_data["id"]), ("phone", normalized_phone), ("cpf", cpf)]
+        matches = [(key, value, self.get(key, value)) for key, value in candidates]
+        found = next((entry for _, _, entry in matches if entry), None)
+        conflicts = [
+            f"{key}={value} aponta para a página {entry.page_id} (escolhida: {found.page_id})"
+            for key, value, entry in matches if entry and entry.page_id != found.page_id
+        ]
+        return found, conflicts
+
+    def print_summary(self):
+        counts = {key: len(self.by_key[key]) for key in self.KEYS}
+        print(f"Encontrados {len(self.entries)} leads no Notion: {counts['rd_id']} com ID do RD, {counts['phone']} com telefone e {counts['cpf']} com CPF.")
+        for key in self.KEYS:
+            for value, page_ids in self.duplicates[key].items():
+                print(f"  !! Aviso: Páginas duplicadas no Notion para {key}={value}: {', '.join(page_ids)}")
+
+# --- NORMALIZAÇÃO DE TELEFONES ---
+# O mesmo telefone aparece na leitura do Notion, na correspondência e no payload: cada valor é calculado uma vez
+@functools.lru_cache(maxsize=131072)
+def normalize_phone_number(phone_str):
+    """
+    Normaliza o número de telefone para o padrão DDD + 8 dígitos,
+    tratando DDD com '0', código de país e o 9º dígito.
+    """
+    if not phone_str:
+        return ""
+    
+    # 1. Remove todos os caracteres não numéricos
+    only_digits = _NON_DIGITS_RE.sub('', str(phone_str))
+    
+    # 2. Remove o '0' de operadora no início, se houver
+    if only_digits.startswith('0'):
+        only_digits = only_digits[1:]
+    
+    # 3. Remove o código de país '55', se houver, e o número for de celular/fixo com DDD
+    if only_digits.startswith('55') and len(only_digits) > 9:
+        only_digits = only_digits[2:]
+    
+    # 4. Trata o nono dígito para padronizar em 8 dígitos + DDD
+    # Se o número tiver 11 dígitos (DDD + 9º dígito + Número)
+    if len(only_digits) == 11:
+        ddd = only_digits[:2]
+        numero = only_digits[2:]
+        # Se for um celular (começa com 9), removemos o 9º dígito
+        if numero.startswith('9'):
+            return ddd + numero[1:]
+    
+    # Se o número tiver 10 dígitos (DDD + 8 dígitos), já está no formato padronizado
+    if len(only_digits) == 10:
+        return only_digits
+        
+    # Para outros formatos (ex: números curtos), retorna o que for possível
+    return only_digits
+
+def normalize_phone_numbers(phones):
+    """Versão em lote: normaliza uma lista de telefones, calculando cada valor distinto uma única vez."""
+    normalized = {phone: normalize_phone_number(phone) for phone in dict.fromkeys(phones)}
+    return [normalized[phone] for phone in phones]
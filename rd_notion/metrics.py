@@ -0,0 +1,182 @@
+"""Métricas da execução: tempos por fase, pedidos HTTP por endpoint e relatório JSON/Prometheus."""
+import datetime
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+
+from .config import RUN_REPORT_FILE, RUN_REPORT_PROMETHEUS_FILE
+
+# --- MÉTRICAS DA EXECUÇÃO ---
+def _percentile(sorted_values, fraction):
+    """Percentil por posição mais próxima sobre uma lista já ordenada."""
+    if not sorted_values: return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+def _latency_summary(samples):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": _percentile(ordered, 0.50),
+        "p95": _percentile(ordered, 0.95),
+        "max": ordered[-1] if ordered else None,
+    }
+
+class RunMetrics:
+    """Acumula tempos por fase, pedidos HTTP por endpoint, durações de funções e contadores da execução."""
+    # Limite de amostras de latência guardadas por endpoint/função (o modo servidor corre indefinidamente)
+    MAX_SAMPLES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            self._started = time.monotonic()
+            self.phases = {}
+            self.endpoints = {}
+            self.functions = {}
+            self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.monotonic() - start)
+
+    def add_phase_time(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _endpoint(self, endpoint):
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {"requests": 0, "status_codes": {}, "errors": 0, "retries": 0,
+                                        "bytes_sent": 0, "bytes_received": 0, "latencies": deque(maxlen=self.MAX_SAMPLES)}
+        return self.endpoints[endpoint]
+
+    def record_request(self, endpoint, elapsed, response=None):
+        """Regista um pedido HTTP; sem response conta como erro de ligação."""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["requests"] += 1
+            stats["latencies"].append(elapsed)
+            if response is None:
+                stats["errors"] += 1; return
+            code = str(response.status_code)
+            stats["status_codes"][code] = stats["status_codes"].get(code, 0) + 1
+            request = getattr(response, "request", None)
+            body = getattr(request, "body", None) or b""
+            stats["bytes_sent"] += len(body)
+            stats["bytes_received"] += len(response.content or b"")
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._endpoint(endpoint)["retries"] += 1
+
+    def record_function(self, name, elapsed):
+        with self._lock:
+            self.functions.setdefault(name, deque(maxlen=self.MAX_SAMPLES)).append(elapsed)
+
+    def report(self):
+        """Devolve o relatório da execução como dicionário serializável em JSON."""
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in self.endpoints.items():
+                endpoints[endpoint] = {k: v for k, v in stats.items() if k != "latencies"}
+                endpoints[endpoint]["status_codes"] = dict(stats["status_codes"])
+                endpoints[endpoint]["latency_seconds"] = _latency_summary(stats["latencies"])
+            return {
+                "started_at": self.started_at,
+                "duration_seconds": time.monotonic() - self._started,
+                "phases_seconds": dict(self.phases),
+                "counters": dict(self.counters),
+                "http": endpoints,
+                "functions_seconds": {name: _latency_summary(samples) for name, samples in self.functions.items()},
+            }
+
+    def prometheus_text(self):
+        """Relatório no formato de texto do Prometheus."""
+        report = self.report()
+        esc = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"')
+        lines = ["# TYPE rd_notion_run_duration_seconds gauge", f"rd_notion_run_duration_seconds {report['duration_seconds']:.6f}",
+                 "# TYPE rd_notion_phase_seconds gauge"]
+        lines += [f'rd_notion_phase_seconds{{phase="{esc(name)}"}} {value:.6f}' for name, value in report["phases_seconds"].items()]
+        lines.append("# TYPE rd_notion_events_total counter")
+        lines += [f'rd_notion_events_total{{event="{esc(name)}"}} {value}' for name, value in report["counters"].items()]
+        quantiles = (("p50", "0.5"), ("p95", "0.95"))
+        http = report["http"]
+        label = lambda endpoint: f'endpoint="{esc(endpoint)}"'
+        # Cada família de métricas tem de ficar agrupada no formato de texto
+        lines.append("# TYPE rd_notion_http_requests_total counter")
+        for endpoint, stats in http.items():
+            for code, count in stats["status_codes"].items():
+                lines.append(f'rd_notion_http_requests_total{{{label(endpoint)},status="{code}"}} {count}')
+            if stats["errors"]: lines.append(f'rd_notion_http_requests_total{{{label(endpoint)},status="error"}} {stats["errors"]}')
+        lines.append("# TYPE rd_notion_http_retries_total counter")
+        lines += [f'rd_notion_http_retries_total{{{label(endpoint)}}} {stats["retries"]}' for endpoint, stats in http.items()]
+        lines.append("# TYPE rd_notion_http_bytes_total counter")
+        for endpoint, stats in http.items():
+            lines.append(f'rd_notion_http_bytes_total{{{label(endpoint)},direction="sent"}} {stats["bytes_sent"]}')
+            lines.append(f'rd_notion_http_bytes_total{{{label(endpoint)},direction="received"}} {stats["bytes_received"]}')
+        for family, labelled in (("rd_notion_http_latency_seconds", {label(e): st["latency_seconds"] for e, st in http.items()}),
+                                 ("rd_notion_function_seconds", {f'function="{esc(n)}"': lat for n, lat in report["functions_seconds"].items()})):
+            lines.append(f"# TYPE {family} summary")
+            for labels, latency in labelled.items():
+                for key, quantile in quantiles:
+                    if latency[key] is not None:
+                        lines.append(f'{family}{{{labels},quantile="{quantile}"}} {latency[key]:.6f}')
+                lines.append(f'{family}_count{{{labels}}} {latency["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self):
+        """Grava o relatório JSON (RUN_REPORT_FILE) e, se configurado, o ficheiro Prometheus."""
+        for filename, content in ((RUN_REPORT_FILE, lambda: json.dumps(self.report(), indent=2, ensure_ascii=False)),
+                                  (RUN_REPORT_PROMETHEUS_FILE, self.prometheus_text)):
+            if not filename: continue
+            try:
+                if os.path.dirname(filename): os.makedirs(os.path.dirname(filename), exist_ok=True)
+                with open(filename, "w", encoding="utf-8") as f:
+                    f.write(content())
+                print(f"Relatório da execução gravado em '{filename}'.")
+            except IOError as e:
+                print(f"!! Aviso: Não foi possível gravar o relatório da execução '{filename}': {e}")
+
+metrics = RunMetrics()
+
+def timed(name):
+    """Decorador que regista a duração de cada chamada da função nas métricas da execução."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record_function(name, time.monotonic() - start)
+        return wrapper
+    return decorator
+
+def timed_request(endpoint, send, method, url, **kwargs):
+    """Executa send(method, url, **kwargs) e regista latência, código de estado e bytes no endpoint indicado."""
+    start = time.monotonic()
+    try:
+        response = send(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        metrics.record_request(endpoint, time.monotonic() - start)
+        raise
+    metrics.record_request(endpoint, time.monotonic() - start, response)
+    return response
@@ -0,0 +1,106 @@
+"""Envio de mensagens de WhatsApp (BotConversa) e fila de alertas agrupados."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .clients import TokenBucket
+from .config import (
+    BOTCONVERSA_API_KEY, BOTCONVERSA_BASE_URL, BOTCONVERSA_MAX_MESSAGE_LENGTH, BOTCONVERSA_MAX_WORKERS,
+    BOTCONVERSA_REQUESTS_PER_SECOND, BOTCONVERSA_SUBSCRIBER_ID,
+)
+from .metrics import timed, timed_request
+
+# --- FUNÇÕES DE WHATSAPP ---
+botconversa_rate_limiter = TokenBucket(BOTCONVERSA_REQUESTS_PER_SECOND)
+# Sessão partilhada (keep-alive) para os envios em paralelo aos subscritores
+botconversa_session = requests.Session()
+botconversa_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, BOTCONVERSA_MAX_WORKERS)))
+botconversa_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, BOTCONVERSA_MAX_WORKERS)))
+
+def split_message(message, max_length=None):
+    """
+    Divide uma mensagem em partes com no máximo max_length caracteres.
+    Corta preferencialmente entre blocos (linha em branco), depois entre linhas e só em último caso a meio do texto.
+    """
+    max_length = max_length or BOTCONVERSA_MAX_MESSAGE_LENGTH
+    if len(message) <= max_length: return [message]
+    pieces = []
+    for block in message.split("\n\n"):
+        if len(block) <= max_length: pieces.append((block, "\n\n")); continue
+        for line in block.split("\n"):
+            while len(line) > max_length:
+                pieces.append((line[:max_length], "\n")); line = line[max_length:]
+            pieces.append((line, "\n"))
+        pieces[-1] = (pieces[-1][0], "\n\n")
+    parts, current, current_sep = [], "", ""
+    for text, sep in pieces:
+        if current and len(current) + len(current_sep) + len(text) > max_length:
+            parts.append(current); current = text
+        else:
+            current = current + current_sep + text if current else text
+        current_sep = sep
+    if current: parts.append(current)
+    return parts
+
+def _send_to_subscriber(subscriber_id, message):
+    # Usando o endpoint de envio validado com o ID fixo
+    url = f"{BOTCONVERSA_BASE_URL}/api/v1/webhook/subscriber/{subscriber_id}/send_message/"
+    headers = {"Content-Type": "application/json", "API-KEY": BOTCONVERSA_API_KEY}
+    payload = {"type": "text", "value": message}
+
+    botconversa_rate_limiter.acquire() # Limite configurável em vez de uma pausa fixa entre envios
+    try:
+        print(f"   -> A enviar mensagem para o subscritor ID: {subscriber_id}")
+        response = timed_request("botconversa POST /send_message", botconversa_session.request, "POST", url, headers=headers, json=payload, timeout=10)
+        response.raise_for_status()
+        print(f"   - Mensagem para {subscriber_id} enviada com sucesso.")
+    except requests.exceptions.RequestException as e:
+        print(f"   ### ERRO ao enviar mensagem para o ID {subscriber_id}: {e}")
+
+@timed("send_whatsapp_message")
+def send_whatsapp_message(message):
+    """
+    Envia a mensagem para uma lista de IDs de subscritores do BotConversa.
+    Os subscritores recebem em paralelo; mensagens longas são divididas e enviadas por ordem.
+    """
+    if not BOTCONVERSA_API_KEY or not BOTCONVERSA_SUBSCRIBER_ID:
+        print("!! Aviso: API Key ou ID do Subscritor do BotConversa não configurados. Mensagem não enviada.")
+        return
+
+    # Pega a string de IDs (ex: "123,456") e a transforma numa lista ["123", "456"], ignorando vírgulas extra
+    subscriber_ids = [id.strip() for id in BOTCONVERSA_SUBSCRIBER_ID.split(',') if id.strip()]
+    parts = split_message(message)
+
+    print(f"   -> A iniciar o envio de {len(parts)} mensagem(ns) para {len(subscriber_ids)} contato(s).")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BOTCONVERSA_MAX_WORKERS, len(subscriber_ids)))) as executor:
+        for part in parts:
+            # Espera que cada parte chegue a todos antes de enviar a seguinte, para manter a ordem
+            list(executor.map(lambda subscriber_id: _send_to_subscriber(subscriber_id, part), subscriber_ids))
+
+class NotificationQueue:
+    """Acumula alertas durante a execução e envia-os agrupados no mínimo de mensagens possível."""
+
+    def __init__(self, title):
+        self.title = title
+        self._alerts = []
+        self._lock = threading.Lock()
+
+    def add(self, alert):
+        with self._lock:
+            self._alerts.append(alert)
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def flush(self):
+        """Envia os alertas acumulados (se houver) e esvazia a fila."""
+        with self._lock:
+            alerts, self._alerts = self._alerts, []
+        if not alerts: return
+        print(f"\n--- A enviar {len(alerts)} alerta(s) agrupado(s) ---")
+        send_whatsapp_message(f"{self.title}\n\n" + "\n\n".join(alerts))
+
+divergence_alerts = NotificationQueue("⚠️ *Alertas de Sincronização*")
@@ -0,0 +1,312 @@
+"""Leitura (snapshot incremental) e escrita de leads na base do Notion."""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from .clients import _retry_delay, notion_request
+from .config import (
+    FORCE_FULL_RESCAN, INDEXED_PROPERTIES, NOTION_API_BASE_URL, NOTION_ID_SWEEP_INTERVAL_HOURS, NOTION_MAX_RETRIES,
+    NOTION_PHONE_PROPERTY, NOTION_RD_ID_PROPERTY, SNAPSHOT_FORMAT_VERSION,
+)
+from .leads import LeadEntry, LeadIndex, compact_notion_properties, normalize_phone_numbers
+from .metrics import metrics, timed
+from .notifications import divergence_alerts
+from .pipelines import DEFAULT_PIPELINE
+from .planner import format_change, plan_lead_create, plan_lead_update
+
+class NotionQueryError(RuntimeError):
+    """A leitura da base do Notion falhou; sincronizar com um índice incompleto criaria páginas duplicadas."""
+
+# --- LEITURA DA BASE DO NOTION (SNAPSHOT INCREMENTAL) ---
+# As funções recebem o pipeline (base, token e ficheiros de estado); por omissão, NOTION_DATABASE_ID e SYNC_STATE_DIR.
+def get_notion_database_properties(pipeline=None):
+    """Devolve o esquema da base do Notion ({nome: propriedade}), ou None em caso de erro."""
+    pipeline = pipeline or DEFAULT_PIPELINE
+    url = f"{NOTION_API_BASE_URL}/databases/{pipeline.database_id}"
+    try:
+        response = notion_request("GET", url, endpoint="notion GET /databases/{id}", token=pipeline.notion_token)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"!! Aviso: Não foi possível ler o esquema da base do Notion: {e}"); return None
+    return response.json().get("properties", {})
+
+def _get_notion_schema_hash(pipeline):
+    """
+    Calcula uma impressão digital do esquema (nomes e tipos das propriedades) da base do Notion
+    e das propriedades indexadas, que dependem do mapeamento de campos.
+    """
+    properties = get_notion_database_properties(pipeline)
+    if properties is None: return None
+    schema = [sorted((name, prop.get("type")) for name, prop in properties.items()), sorted(INDEXED_PROPERTIES)]
+    return hashlib.sha256(json.dumps(schema, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def load_notion_snapshot(pipeline=None):
+    """Lê o snapshot local da base do Notion. Devolve None se não existir ou estiver corrompido."""
+    snapshot_file = (pipeline or DEFAULT_PIPELINE).snapshot_file
+    if not os.path.exists(snapshot_file):
+        return None
+    try:
+        with open(snapshot_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"!! Aviso: Snapshot local do Notion ilegível, será feita uma leitura completa: {e}")
+        return None
+
+def save_notion_snapshot(snapshot, pipeline=None):
+    """Grava o snapshot de forma atómica (ficheiro temporário + rename)."""
+    pipeline = pipeline or DEFAULT_PIPELINE
+    os.makedirs(pipeline.state_dir, exist_ok=True)
+    tmp_filename = pipeline.snapshot_file + ".tmp"
+    try:
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_filename, pipeline.snapshot_file)
+    except IOError as e:
+        print(f"!! Aviso: Não foi possível gravar o snapshot local do Notion: {e}")
+
+_snapshot_lock = threading.Lock()
+
+def forget_notion_pages(page_ids, pipeline=None):
+    """Retira páginas do snapshot local (ex: arquivadas no Notion), para que não voltem ao índice na próxima leitura."""
+    with _snapshot_lock:
+        snapshot = load_notion_snapshot(pipeline)
+        if not snapshot: return
+        removed = [page_id for page_id in page_ids if snapshot["pages"].pop(page_id, None) is not None]
+        if removed: save_notion_snapshot(snapshot, pipeline)
+
+def iter_database_pages(pipeline=None, query_filter=None, params=None):
+    """Percorre todas as páginas de uma consulta à base do Notion (erros levantam RequestException)."""
+    pipeline = pipeline or DEFAULT_PIPELINE
+    url = f"{NOTION_API_BASE_URL}/databases/{pipeline.database_id}/query"
+    has_more, next_cursor = True, None
+    while has_more:
+        payload = {"page_size": 100}
+        if next_cursor: payload['start_cursor'] = next_cursor
+        if query_filter: payload['filter'] = query_filter
+        response = notion_request("POST", url, endpoint="notion POST /databases/{id}/query", token=pipeline.notion_token,
+                                  json=payload, params=params)
+        response.raise_for_status()
+        data = response.json()
+        yield from data['results']
+        has_more, next_cursor = data['has_more'], data['next_cursor']
+
+def query_page_ids(pipeline=None):
+    """Leitura só dos IDs (e last_edited_time): o título é a propriedade mais pequena que se pode pedir."""
+    return {page["id"]: page.get("last_edited_time") for page in iter_database_pages(pipeline, params={"filter_properties": "title"})}
+
+@timed("get_existing_notion_leads")
+def get_existing_notion_leads(pipeline=None):
+    """
+    Busca leads do Notion para mapeamento, usando um snapshot local incremental.
+    Só as páginas editadas depois da última marca (last_edited_time) são pedidas à API;
+    a leitura completa só acontece a pedido (FORCE_FULL_RESCAN) ou se o esquema mudar.
+    A consulta não devolve páginas arquivadas nem apagadas: a cada NOTION_ID_SWEEP_INTERVAL_HOURS, uma leitura
+    só dos IDs retira do snapshot as que desapareceram (entre leituras, ver _is_archived_page_error).
+    Devolve um LeadIndex com entradas compactas (ID da página e valores simples).
+    Levanta NotionQueryError se alguma página da consulta falhar (o snapshot não é alterado).
+    """
+    pipeline = pipeline or DEFAULT_PIPELINE
+    print(f"{pipeline.prefix}A buscar leads existentes no Notion para mapeamento...")
+
+    snapshot = load_notion_snapshot(pipeline)
+    schema_hash = _get_notion_schema_hash(pipeline)
+    full_rescan = (
+        FORCE_FULL_RESCAN
+        or snapshot is None
+        or snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION
+        or schema_hash is None
+        or snapshot.get("schema_hash") != schema_hash
+        or snapshot.get("database_id") != pipeline.database_id
+    )
+    fetched = 0
+    ids_checked_at = None if full_rescan else snapshot.get("ids_checked_at")
+    try:
+        if full_rescan:
+            print(f"   -> {pipeline.prefix}Leitura completa da base do Notion.")
+            pages, high_water_mark = {}, None
+            query_filter = None
+            ids_checked_at = time.time() # A leitura completa já só traz as páginas ativas
+        else:
+            pages, high_water_mark = snapshot["pages"], snapshot.get("high_water_mark")
+            if ids_checked_at is None or time.time() - ids_checked_at >= NOTION_ID_SWEEP_INTERVAL_HOURS * 3600:
+                ids_checked_at = time.time()
+                live_page_ids = query_page_ids(pipeline)
+                removed = [page_id for page_id in pages if page_id not in live_page_ids]
+                for page_id in removed:
+                    del pages[page_id]
+                if removed:
+                    print(f"   -> {pipeline.prefix}{len(removed)} página(s) arquivada(s) ou apagada(s) no Notion retirada(s) do snapshot.")
+                    metrics.incr("notion_pages_removed", len(removed))
+            if high_water_mark:
+                print(f"   -> {pipeline.prefix}Leitura incremental: páginas editadas desde {high_water_mark} ({len(pages)} em cache).")
+            # 'on_or_after' porque o Notion arredonda o last_edited_time ao minuto
+            query_filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": high_water_mark}} if high_water_mark else None
+
+        for page in iter_database_pages(pipeline, query_filter):
+            fetched += 1
+            if page.get("archived") or page.get("in_trash"):
+                pages.pop(page["id"], None); continue
+            # Guarda só o necessário para a comparação futura: [last_edited_time, {propriedade: valor simples}]
+            pages[page["id"]] = [page.get("last_edited_time"), compact_notion_properties(page["properties"])]
+            if page.get("last_edited_time") and (high_water_mark is None or page["last_edited_time"] > high_water_mark):
+                high_water_mark = page["last_edited_time"]
+    except requests.exceptions.RequestException as e:
+        print(f"### ERRO ao buscar leads do Notion: {pipeline.prefix}{e}")
+        raise NotionQueryError(f"Consulta à base do Notion falhou: {e}")
+
+    save_notion_snapshot({
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "database_id": pipeline.database_id,
+        "schema_hash": schema_hash,
+        "high_water_mark": high_water_mark,
+        "ids_checked_at": ids_checked_at,
+        "pages": pages,
+    }, pipeline)
+    print(f"   -> {pipeline.prefix}{fetched} página(s) lida(s) da API; {len(pages)} página(s) no snapshot.")
+
+    index = LeadIndex()
+    phones = normalize_phone_numbers([values.get(NOTION_PHONE_PROPERTY) for _, values in pages.values()])
+    for (page_id, (last_edited_time, values)), phone in zip(pages.items(), phones):
+        index.add(LeadEntry(page_id, last_edited_time, values, phone))
+    index.print_summary()
+    return index
+
+# --- ESCRITA NO NOTION ---
+def _queue_divergence_alert(operation, pipeline):
+    """O alerta de divergência é agrupado com os restantes e enviado no fim da execução."""
+    divergence = operation["status_divergence"]
+    print(f"  !! Aviso: Status no Notion ('{divergence['notion']}') é diferente do esperado ('{divergence['rd']}'). O Status não será alterado.")
+    alert_message = (
+        f"O lead *{operation['name']}* teve uma divergência de status.\n"
+        f"*- Status no Notion:* {divergence['notion']}\n"
+        f"*- Etapa no RD (esperado):* {divergence['rd']}"
+    )
+    if pipeline.name: alert_message += f"\n*- Funil:* {pipeline.name}"
+    if operation["changes"]:
+        alert_message += "\n*Outras Alterações Realizadas:*\n" + "\n".join(format_change(change) for change in operation["changes"])
+    divergence_alerts.add(alert_message)
+
+def _is_archived_page_error(response):
+    """O Notion recusa editar páginas arquivadas (400 validation_error) e já não encontra as apagadas (404)."""
+    if response.status_code == 404: return True
+    return response.status_code == 400 and "archived" in response.text
+
+@timed("update_lead_in_notion")
+def _patch_lead_page(operation, pipeline):
+    print(f"  -> {pipeline.prefix}A ATUALIZAR lead no Notion: '{operation['name']}'")
+    url = f"{NOTION_API_BASE_URL}/pages/{operation['page_id']}"
+    response = notion_request("PATCH", url, endpoint="notion PATCH /pages/{id}", token=pipeline.notion_token,
+                              json={"properties": operation["properties"]})
+    if response.status_code == 200:
+        return f"- Lead atualizado: *{operation['name']}*\n  ({len(operation['changes'])} campos alterados)", response.json()
+    if _is_archived_page_error(response):
+        print(f"  !! Aviso: A página {operation['page_id']} do lead '{operation['name']}' foi arquivada ou apagada no Notion.")
+        forget_notion_pages([operation["page_id"]], pipeline)
+        operation["reason"] = "page_archived"
+        return None, None
+    print(f"  ### ERRO ao atualizar lead no Notion: {response.text}")
+    return None, None
+
+def find_page_by_rd_id(rd_id, pipeline=None):
+    """Procura diretamente na API a página com este ID do RD (sem passar pelo índice). Devolve o ID da página ou None."""
+    pipeline = pipeline or DEFAULT_PIPELINE
+    url = f"{NOTION_API_BASE_URL}/databases/{pipeline.database_id}/query"
+    payload = {"filter": {"property": NOTION_RD_ID_PROPERTY, "rich_text": {"equals": rd_id}}, "page_size": 1}
+    response = notion_request("POST", url, endpoint="notion POST /databases/{id}/query", token=pipeline.notion_token, json=payload)
+    if response.status_code != 200:
+        raise NotionQueryError(f"Consulta da página do lead {rd_id} falhou com {response.status_code}")
+    results = response.json().get("results") or []
+    return results[0]["id"] if results else None
+
+def create_summary(operation):
+    """Resumo de uma criação para o relatório do WhatsApp."""
+    lead_phone = (operation["properties"] or {}).get("Telefone", {}).get("phone_number", "N/A")
+    return (f"*Lead Adicionado*\n- *Nome:* {operation['name']}\n- *Telefone:* {lead_phone}\n- *Status:* {operation['situacao']}")
+
+@timed("create_lead_in_notion")
+def _create_lead_page(operation, pipeline):
+    """
+    Cria a página do lead e devolve (resumo, página criada ou None).
+    Uma criação sem resposta (timeout, ligação cortada ou 5xx) pode ter sido feita pelo Notion:
+    antes de cada nova tentativa, a página é procurada pelo ID do RD e, se já existir, não é criada outra vez.
+    """
+    print(f"  -> {pipeline.prefix}A CRIAR novo lead no Notion: '{operation['name']}'")
+    url = f"{NOTION_API_BASE_URL}/pages"
+    properties_payload = operation["properties"]
+    payload = {"parent": {"database_id": pipeline.database_id}, "properties": properties_payload}
+    response = None
+    for attempt in range(NOTION_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(_retry_delay(attempt - 1, response))
+            metrics.record_retry("notion POST /pages")
+            page_id = find_page_by_rd_id(operation["rd_id"], pipeline)
+            if page_id:
+                print(f"  -> Lead '{operation['name']}' já foi criado no Notion (página {page_id}); criação não repetida.")
+                operation["page_id"] = page_id
+                return create_summary(operation), None
+        try:
+            response = notion_request("POST", url, endpoint="notion POST /pages", token=pipeline.notion_token, idempotent=False, json=payload)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == NOTION_MAX_RETRIES: raise
+            print(f"  !! Aviso: Criação do lead '{operation['name']}' sem resposta do Notion ({e}).")
+            response = None
+            continue
+        if response.status_code == 200:
+            page = response.json()
+            operation["page_id"] = page.get("id")
+            return create_summary(operation), page
+        if response.status_code < 500 or attempt == NOTION_MAX_RETRIES: break
+        print(f"  !! Aviso: Notion respondeu {response.status_code} à criação do lead '{operation['name']}'.")
+    print(f"  ### ERRO ao criar lead no Notion: {response.text}")
+    return None, None
+
+def _update_index_from_page(lead_index, page):
+    """Substitui a entrada da página no índice em memória pela página devolvida por uma escrita."""
+    lead_index.remove(page["id"])
+    lead_index.add(LeadEntry(page["id"], page.get("last_edited_time"), compact_notion_properties(page.get("properties") or {})))
+
+def apply_operation(operation, pipeline=None, lead_data=None, lead_index=None):
+    """
+    Aplica uma operação do plano (ver planner.py) na base do pipeline.
+    Se a página de um update foi arquivada ou apagada no Notion, sai do snapshot (e de lead_index, se dado)
+    e, com os dados da negociação (lead_data), a operação passa a ser a criação de uma página nova.
+    Com lead_index, o índice em memória é atualizado com a página devolvida pela escrita (sem reler a base).
+    Devolve o resumo da escrita, "" se não havia nada a escrever, ou None em caso de erro.
+    """
+    pipeline = pipeline or DEFAULT_PIPELINE
+    if operation["status_divergence"]:
+        _queue_divergence_alert(operation, pipeline)
+    if operation["op"] == "update":
+        summary, page = _patch_lead_page(operation, pipeline)
+        if operation["reason"] == "page_archived":
+            metrics.incr("notion_pages_archived")
+            if lead_index is not None: lead_index.remove(operation["page_id"])
+            if lead_data is None: return None
+            create_operation = plan_lead_create(lead_data, operation["situacao"])
+            operation.update(op="create", page_id=None, properties=create_operation["properties"], changes=[], status_divergence=None)
+            summary, page = _create_lead_page(operation, pipeline)
+    elif operation["op"] == "create":
+        summary, page = _create_lead_page(operation, pipeline)
+    else:
+        return ""
+    # Guardado nas impressões digitais: uma edição posterior no Notion volta a pôr o lead em comparação
+    operation["last_edited_time"] = page.get("last_edited_time") if page else None
+    if lead_index is not None and page: _update_index_from_page(lead_index, page)
+    return summary
+
+def update_lead_in_notion(lead_entry, lead_data, situacao):
+    """
+    Compara campos e detalha as alterações no alerta do WhatsApp.
+    Devolve o resumo da atualização, "" se não havia nada a alterar, ou None em caso de erro.
+    """
+    operation = plan_lead_update(lead_entry, lead_data, situacao)
+    if operation["op"] == "skip":
+        print(f"  -> Nenhuma alteração detetada para o lead '{operation['name']}'.")
+    return apply_operation(operation, lead_data=lead_data)
+
+def create_lead_in_notion(lead_data, situacao):
+    return apply_operation(plan_lead_create(lead_data, situacao))
@@ -0,0 +1,53 @@
+"""Pares (etapas do RD -> base do Notion) sincronizados pelo mesmo processo, cada um com o seu estado local."""
+import os
+
+from .config import (
+    DEAL_FINGERPRINTS_FILE, NOTION_DATABASE_ID, NOTION_SNAPSHOT_FILE, NOTION_TOKEN, PIPELINES_CONFIG_PATH, RD_STAGES_MAP,
+    SYNC_JOURNAL_FILE, SYNC_PLAN_FILE, SYNC_STATE_DIR, load_pipelines_config,
+)
+
+class Pipeline:
+    """
+    Um funil: as etapas do RD ({stage_id: Status no Notion}), a base de destino e o token da integração.
+    Cada pipeline com nome guarda o snapshot, as impressões digitais, o diário e o plano em SYNC_STATE_DIR/pipelines/<nome>;
+    o pipeline por omissão (sem nome) usa os ficheiros de sempre.
+    """
+
+    def __init__(self, name, database_id, stages_map, notion_token=None):
+        self.name = name
+        self.database_id = database_id
+        self.stages_map = stages_map
+        self.notion_token = notion_token or NOTION_TOKEN
+        if name:
+            self.state_dir = os.path.join(SYNC_STATE_DIR, "pipelines", name)
+            self.snapshot_file = os.path.join(self.state_dir, "notion_snapshot.json")
+            self.fingerprints_file = os.path.join(self.state_dir, "deal_fingerprints.json")
+            self.journal_file = os.path.join(self.state_dir, "sync_journal.jsonl")
+            self.plan_file = os.path.join(self.state_dir, "sync_plan.json")
+        else:
+            self.state_dir = SYNC_STATE_DIR
+            self.snapshot_file, self.fingerprints_file = NOTION_SNAPSHOT_FILE, DEAL_FINGERPRINTS_FILE
+            self.journal_file, self.plan_file = SYNC_JOURNAL_FILE, SYNC_PLAN_FILE
+
+    @property
+    def prefix(self):
+        """Prefixo das mensagens na consola, para distinguir os pipelines quando correm em paralelo."""
+        return f"[{self.name}] " if self.name else ""
+
+DEFAULT_PIPELINE = Pipeline(None, NOTION_DATABASE_ID, RD_STAGES_MAP)
+
+def load_pipelines(names=None):
+    """
+    Devolve os pipelines de PIPELINES_CONFIG_PATH (só os de names, se dado) ou [DEFAULT_PIPELINE] sem ficheiro.
+    Levanta ValueError se a configuração for inválida ou um nome pedido não existir.
+    """
+    if not PIPELINES_CONFIG_PATH:
+        if names: raise ValueError("--pipeline requer um ficheiro de pipelines (PIPELINES_CONFIG_PATH).")
+        return [DEFAULT_PIPELINE]
+    pipelines = [Pipeline(entry["name"], entry["database_id"], entry["stages"], entry["notion_token"])
+                 for entry in load_pipelines_config(PIPELINES_CONFIG_PATH)]
+    if names:
+        unknown = set(names) - {pipeline.name for pipeline in pipelines}
+        if unknown: raise ValueError(f"Pipeline(s) desconhecido(s): {', '.join(sorted(unknown))}")
+        pipelines = [pipeline for pipeline in pipelines if pipeline.name in names]
+    return pipelines
@@ -0,0 +1,234 @@
+"""Plano de alterações da sincronização: compara o RD com o índice do Notion sem fazer nenhuma escrita."""
+import hashlib
+import json
+import os
+
+from .config import RD_STAGES_MAP
+from .fields import FIELD_MAP
+from .leads import (
+    _get_simple_value_from_prop, build_properties_payload, get_lead_phone, normalize_phone_numbers, normalize_property_value,
+)
+
+# Tipos de operação: create e update escrevem no Notion; divergence só gera um alerta; skip não faz nada
+OPERATION_KINDS = ("create", "update", "divergence", "skip")
+
+# --- IMPRESSÕES DIGITAIS DAS NEGOCIAÇÕES (DETEÇÃO DE ALTERAÇÕES) ---
+def compute_deal_fingerprint(lead_data, situacao):
+    """
+    Impressão digital estável dos dados do RD que são sincronizados (nome, telefone, etapa e campos mapeados).
+    Inclui a assinatura do mapeamento, para que uma alteração ao mapeamento volte a comparar todos os leads.
+    """
+    lead_phone = get_lead_phone(lead_data)
+    custom_fields = sorted(
+        (field["custom_field"]["_id"], field.get("value"))
+        for field in lead_data.get("deal_custom_fields", [])
+        if field["custom_field"]["_id"] in FIELD_MAP.by_rd_id
+    )
+    material = [lead_data.get("name"), lead_phone, situacao, custom_fields, FIELD_MAP.signature]
+    return hashlib.sha1(json.dumps(material, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+# --- OPERAÇÕES POR LEAD ---
+def find_notion_page(lead_data, lead_index, normalized_phone=None):
+    """Procura a página do Notion de uma negociação no índice e avisa sobre correspondências em conflito."""
+    lead_entry, conflicts = lead_index.match_lead(lead_data, normalized_phone=normalized_phone)
+    for conflict in conflicts:
+        print(f"  !! Aviso: Correspondência em conflito para '{lead_data.get('name', lead_data['id'])}': {conflict}")
+    return lead_entry, conflicts
+
+def _new_operation(kind, lead_data, situacao, **extra):
+    operation = {
+        "op": kind,
+        "rd_id": lead_data["id"],
+        "name": lead_data.get("name", "Negociação sem nome"),
+        "situacao": situacao,
+        "page_id": None,
+        "changes": [],
+        "status_divergence": None,
+        "properties": None,
+        "reason": None,
+    }
+    operation.update(extra)
+    return operation
+
+def plan_lead_create(lead_data, situacao, properties=None):
+    """Operação de criação de uma página nova para a negociação (properties: payload já construído, se houver)."""
+    if properties is None: properties = build_properties_payload(lead_data, situacao)
+    return _new_operation("create", lead_data, situacao, properties=properties)
+
+def plan_lead_update(lead_entry, lead_data, situacao, properties=None):
+    """
+    Compara os campos enviados pelo RD com a página do Notion e devolve a operação resultante:
+    update (com as alterações campo a campo), divergence (só o Status diverge) ou skip.
+    O payload de um update só leva as propriedades que mudaram (properties: payload completo já construído, se houver).
+    """
+    new_properties_payload = properties if properties is not None else build_properties_payload(lead_data, situacao)
+    old_values = lead_entry.values
+
+    # Compara apenas os campos que realmente estão a ser enviados, normalizados como o Notion os devolve
+    changes, delta = [], {}
+    for prop_name, new_prop_obj in new_properties_payload.items():
+        if prop_name == "Status": continue
+        old_value = old_values.get(prop_name)
+        new_value = _get_simple_value_from_prop(new_prop_obj)
+        if normalize_property_value(old_value) != normalize_property_value(new_value):
+            changes.append({"property": prop_name, "old": old_value, "new": new_value})
+            delta[prop_name] = new_prop_obj
+
+    # Lógica de exceção para o Status: uma divergência gera um alerta e o Status não é alterado.
+    # Só a primeira opção do Status no Notion conta, como sempre.
+    current_status = (old_values.get("Status") or [None])[0]
+    status_divergence = None
+    if current_status and current_status != situacao:
+        status_divergence = {"notion": current_status, "rd": situacao}
+    elif current_status != situacao:
+        delta["Status"] = new_properties_payload["Status"]
+
+    if delta:
+        kind = "update"
+    else:
+        kind = "divergence" if status_divergence else "skip"
+    return _new_operation(
+        kind, lead_data, situacao, page_id=lead_entry.page_id, changes=changes,
+        status_divergence=status_divergence, properties=delta or None,
+        reason="unchanged" if kind == "skip" else None,
+    )
+
+def format_change(change):
+    return f"- *{change['property']}:* de '{change['old'] or 'vazio'}' para '{change['new']}'"
+
+# --- PLANO COMPLETO ---
+class SyncPlan:
+    """Lista ordenada de operações de uma sincronização, serializável em JSON."""
+
+    def __init__(self):
+        self.operations = []
+        self.duplicates = [] # Negociações vindas de mais de uma etapa do RD
+        self.deals_per_stage = {}
+        self.conflicting_matches = 0
+        self.fingerprints = {} # {rd_id: impressão digital} das operações planeadas
+        self.deals = {} # {rd_id: negociação} das operações comparadas (não é gravado), para recriar páginas arquivadas
+        self.incomplete_stages = [] # Etapas do RD que não foram lidas por completo: o plano não cobre todas as negociações
+
+    def __len__(self):
+        return len(self.operations)
+
+    def counts(self):
+        counts = dict.fromkeys(OPERATION_KINDS, 0)
+        for operation in self.operations:
+            counts[operation["op"]] += 1
+        return counts
+
+    def pending(self):
+        """Operações que o executor tem de aplicar (escritas e alertas de divergência)."""
+        return [operation for operation in self.operations if operation["op"] != "skip"]
+
+    def to_dict(self):
+        return {
+            "counts": self.counts(),
+            "deals_per_stage": self.deals_per_stage,
+            "duplicates": self.duplicates,
+            "conflicting_matches": self.conflicting_matches,
+            "incomplete_stages": self.incomplete_stages,
+            "operations": self.operations,
+        }
+
+    def save(self, filename):
+        directory = os.path.dirname(filename)
+        if directory: os.makedirs(directory, exist_ok=True)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+    def print_plan(self):
+        counts = self.counts()
+        print(f"\n--- PLANO DA SINCRONIZAÇÃO: {counts['create']} criação(ões), {counts['update']} atualização(ões), "
+              f"{counts['divergence']} divergência(s) de status, {counts['skip']} lead(s) sem alterações ---")
+        for operation in self.operations:
+            if operation["op"] == "create":
+                print(f"  + CRIAR '{operation['name']}' ({operation['situacao']})")
+            elif operation["op"] == "update":
+                print(f"  ~ ATUALIZAR '{operation['name']}' (página {operation['page_id']})")
+                for change in operation["changes"]:
+                    print(f"      {change['property']}: '{change['old'] or 'vazio'}' -> '{change['new']}'")
+            elif operation["reason"] == "page_conflict":
+                print(f"  x CONFLITO '{operation['name']}': {operation['conflicts'][-1]}")
+            if operation["status_divergence"]:
+                divergence = operation["status_divergence"]
+                print(f"  ! DIVERGÊNCIA '{operation['name']}': Status no Notion '{divergence['notion']}', etapa no RD '{divergence['rd']}'")
+        for duplicate in self.duplicates:
+            print(f"  !! Aviso: Negociação {duplicate['rd_id']} encontrada nas etapas {', '.join(duplicate['stages'])}; usada '{duplicate['kept']}'.")
+        if self.incomplete_stages:
+            print(f"  !! Aviso: PLANO INCOMPLETO: as etapas {', '.join(self.incomplete_stages)} não foram lidas por completo do RD.")
+
+def _prefer_deal(current, candidate):
+    """Entre duas cópias da mesma negociação, fica a atualizada mais recentemente (e, em empate, a da etapa mais avançada)."""
+    current_key = (current[2].get("updated_at") or "", current[0])
+    candidate_key = (candidate[2].get("updated_at") or "", candidate[0])
+    return candidate if candidate_key > current_key else current
+
+def build_sync_plan(deal_stream, lead_index, previous_fingerprints, stages_map=RD_STAGES_MAP):
+    """
+    Constrói o plano a partir do fluxo de negociações do RD ((stage_id, posição, negociação)) e do índice do Notion.
+    Negociações repetidas entre etapas são reduzidas a uma; as inalteradas desde a última execução são ignoradas.
+    Cada página do Notion recebe no máximo uma operação: a da negociação com o mesmo ID do RD tem prioridade, e outra
+    negociação que só corresponda à página por telefone/CPF fica como conflito (sem escrita) em vez de a sobrescrever.
+    """
+    plan = SyncPlan()
+    stage_order = {stage_id: i for i, stage_id in enumerate(stages_map)}
+    plan.deals_per_stage = {situacao: 0 for situacao in stages_map.values()}
+    deals = {} # {rd_id: (ordem da etapa, posição, negociação, stage_id)}
+    stages_seen = {}
+    for stage_id, position, lead in deal_stream:
+        plan.deals_per_stage[stages_map[stage_id]] += 1
+        candidate = (stage_order[stage_id], position, lead, stage_id)
+        stages_seen.setdefault(lead["id"], []).append(stages_map[stage_id])
+        deals[lead["id"]] = _prefer_deal(deals[lead["id"]], candidate) if lead["id"] in deals else candidate
+    for rd_lead_id, stages in stages_seen.items():
+        if len(stages) > 1:
+            plan.duplicates.append({"rd_id": rd_lead_id, "stages": stages, "kept": stages_map[deals[rd_lead_id][3]]})
+
+    # Ordem das etapas e do RD, para planos e relatórios determinísticos
+    to_compare = []
+    claimed_pages = set() # Páginas já atribuídas a uma negociação neste plano
+    for _, _, lead, stage_id in sorted(deals.values(), key=lambda item: item[:2]):
+        rd_lead_id = lead["id"]
+        notion_situacao = stages_map[stage_id]
+        fingerprint = compute_deal_fingerprint(lead, notion_situacao)
+        previous = previous_fingerprints.get(rd_lead_id)
+
+        # Negociação inalterada desde a última sincronização bem-sucedida, e página não editada no Notion desde então:
+        # nada a formatar nem a comparar
+        lead_entry = lead_index.get("rd_id", rd_lead_id)
+        if lead_entry: claimed_pages.add(lead_entry.page_id)
+        if (previous and lead_entry and previous["fingerprint"] == fingerprint and previous.get("page_id") == lead_entry.page_id
+                and previous.get("last_edited_time") == lead_entry.last_edited_time):
+            plan.operations.append(_new_operation("skip", lead, notion_situacao, page_id=lead_entry.page_id, reason="fingerprint"))
+            plan.fingerprints[rd_lead_id] = previous
+            continue
+        to_compare.append((lead, notion_situacao, fingerprint))
+
+    # Campos personalizados convertidos e telefones normalizados em lote; o telefone serve à correspondência e ao payload
+    custom_properties = FIELD_MAP.convert_many([lead for lead, _, _ in to_compare])
+    phones = normalize_phone_numbers([get_lead_phone(lead) for lead, _, _ in to_compare])
+    for (lead, notion_situacao, fingerprint), lead_custom_properties, normalized_phone in zip(to_compare, custom_properties, phones):
+        rd_lead_id = lead["id"]
+        plan.deals[rd_lead_id] = lead
+        lead_entry, conflicts = find_notion_page(lead, lead_index, normalized_phone)
+        if lead_entry and lead_entry.rd_id != rd_lead_id and lead_entry.page_id in claimed_pages:
+            conflict = f"a página {lead_entry.page_id} já pertence a outra negociação deste plano"
+            print(f"  !! Aviso: Correspondência em conflito para '{lead.get('name', rd_lead_id)}': {conflict}. Negociação ignorada.")
+            plan.conflicting_matches += 1
+            plan.operations.append(_new_operation("skip", lead, notion_situacao, reason="page_conflict", conflicts=conflicts + [conflict]))
+            continue
+        if lead_entry: claimed_pages.add(lead_entry.page_id)
+        if conflicts: plan.conflicting_matches += 1
+        properties = build_properties_payload(lead, notion_situacao, lead_custom_properties, normalized_phone)
+        if lead_entry:
+            operation = plan_lead_update(lead_entry, lead, notion_situacao, properties)
+        else:
+            operation = plan_lead_create(lead, notion_situacao, properties)
+        if conflicts: operation["conflicts"] = conflicts
+        plan.operations.append(operation)
+        # last_edited_time da página comparada; numa escrita, passa a ser o da resposta do Notion (ver sync)
+        plan.fingerprints[rd_lead_id] = {"fingerprint": fingerprint, "updated_at": lead.get("updated_at"), "page_id": operation["page_id"],
+                                         "last_edited_time": lead_entry.last_edited_time if lead_entry else None}
+    return plan
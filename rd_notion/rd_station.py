@@ -0,0 +1,104 @@
+"""Leitura de negociações do RD Station (paginada e em paralelo)."""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .clients import _retry_delay
+from .config import RD_API_BASE_URL, RD_CRM_TOKEN, RD_MAX_RETRIES, RD_MAX_WORKERS, RD_PAGE_SIZE, RD_STAGES_MAP
+from .metrics import metrics, timed, timed_request
+
+class RDFetchError(RuntimeError):
+    """Etapas do RD que não foram lidas por completo, mesmo depois das novas tentativas."""
+
+# --- LEITURA DO RD STATION ---
+# Sessão partilhada (keep-alive) para todos os pedidos ao RD Station
+rd_session = requests.Session()
+rd_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, RD_MAX_WORKERS)))
+rd_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, RD_MAX_WORKERS)))
+
+def _rd_get(endpoint, url, params):
+    """
+    GET ao RD Station com novas tentativas: 429 respeita o Retry-After; 5xx e erros de ligação usam backoff.
+    Levanta a exceção do último erro se todas as tentativas falharem.
+    """
+    for attempt in range(RD_MAX_RETRIES + 1):
+        if attempt: metrics.record_retry(endpoint)
+        try:
+            response = timed_request(endpoint, rd_session.request, "GET", url, params=params, timeout=30)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == RD_MAX_RETRIES: raise
+            delay = _retry_delay(attempt)
+            print(f"  !! Aviso: Falha de ligação ao RD Station ({e}). Nova tentativa em {delay:.1f}s.")
+        else:
+            if response.status_code != 429 and response.status_code < 500: break
+            if attempt == RD_MAX_RETRIES: break
+            delay = _retry_delay(attempt, response)
+            print(f"  !! Aviso: RD Station respondeu {response.status_code}. Nova tentativa em {delay:.1f}s.")
+        time.sleep(delay)
+    response.raise_for_status()
+    return response.json()
+
+@timed("fetch_rd_deals_page")
+def _fetch_rd_deals_page(stage_id, page):
+    """Busca uma página de negociações de uma etapa do RD Station."""
+    params = {"token": RD_CRM_TOKEN, "deal_stage_id": stage_id, "page": page, "limit": RD_PAGE_SIZE}
+    return _rd_get("rd GET /deals", f"{RD_API_BASE_URL}/deals", params)
+
+def iter_rd_station_deals(stage_ids, stage_names=None, incomplete_stages=None):
+    """
+    Busca as negociações de várias etapas em paralelo, seguindo a paginação até ao fim.
+    Gera tuplos (stage_id, posição, negociação) à medida que cada página chega;
+    a posição permite reconstruir a ordem original da etapa.
+    stage_names ({stage_id: nome}, por omissão RD_STAGES_MAP) só nomeia os tempos de cada etapa nas métricas.
+    Uma página que falha em todas as tentativas deixa a etapa incompleta: o stage_id é juntado a
+    incomplete_stages (um set, se dado), para quem chama não tratar a leitura como completa.
+    """
+    stage_names = stage_names or RD_STAGES_MAP
+    with ThreadPoolExecutor(max_workers=max(1, RD_MAX_WORKERS)) as executor:
+        pending = {}
+        last_scheduled = {}
+        stage_started, stage_pending = {}, {}
+
+        def schedule(stage_id, page):
+            stage_started.setdefault(stage_id, time.monotonic())
+            stage_pending[stage_id] = stage_pending.get(stage_id, 0) + 1
+            pending[executor.submit(_fetch_rd_deals_page, stage_id, page)] = (stage_id, page)
+            last_scheduled[stage_id] = max(last_scheduled.get(stage_id, 0), page)
+
+        for stage_id in stage_ids:
+            schedule(stage_id, 1)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage_id, page = pending.pop(future)
+                stage_pending[stage_id] -= 1
+                try:
+                    data = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"### ERRO ao buscar negociações da etapa {stage_id} (página {page}) no RD Station: {e}")
+                    metrics.incr("rd_fetch_errors")
+                    if incomplete_stages is not None: incomplete_stages.add(stage_id)
+                    data = {}
+
+                # Com o total conhecido na primeira página, pedimos as restantes de uma vez
+                if page == 1 and data.get("total"):
+                    total_pages = -(-int(data["total"]) // RD_PAGE_SIZE)
+                    for next_page in range(2, total_pages + 1):
+                        schedule(stage_id, next_page)
+                if data.get("has_more") and page == last_scheduled[stage_id]:
+                    schedule(stage_id, page + 1)
+                if not stage_pending[stage_id]:
+                    metrics.add_phase_time(f"rd_fetch[{stage_names.get(stage_id, stage_id)}]", time.monotonic() - stage_started[stage_id])
+
+                for index, deal in enumerate(data.get("deals", [])):
+                    yield stage_id, (page - 1) * RD_PAGE_SIZE + index, deal
+
+def fetch_rd_station_deal(deal_id):
+    """Busca uma única negociação do RD Station pelo ID. Devolve None em caso de erro."""
+    try:
+        return _rd_get("rd GET /deals/{id}", f"{RD_API_BASE_URL}/deals/{deal_id}", {"token": RD_CRM_TOKEN})
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Erro ao buscar a negociação {deal_id} no RD Station: {e}"); return None
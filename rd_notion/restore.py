@@ -0,0 +1,68 @@
+"""Reconstrói um CSV da base do Notion num dado momento a partir de uma base e dos seus deltas (ver backup.py)."""
+import csv
+import datetime
+import gzip
+import os
+import re
+
+from .backup import BACKUP_META_COLUMNS, BACKUP_TIMESTAMP_FORMAT
+
+_BACKUP_FILE_RE = re.compile(r'^backup_notion_(base|delta)_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.csv(?:\.gz)?$')
+
+def _open_csv(filename, mode):
+    if filename.endswith(".gz"): return gzip.open(filename, mode + "t", newline="", encoding="utf-8")
+    return open(filename, mode, newline="", encoding="utf-8")
+
+def list_backup_files(directory):
+    """Devolve [(timestamp, tipo, caminho)] dos ficheiros de backup da pasta, por ordem cronológica."""
+    files = []
+    for name in os.listdir(directory):
+        match = _BACKUP_FILE_RE.match(name)
+        if match: files.append((match.group(2), match.group(1), os.path.join(directory, name)))
+    return sorted(files)
+
+def select_backup_chain(files, at=None):
+    """Escolhe a base mais recente até ao momento `at` (AAAA-MM-DD_HH-MM-SS) e os deltas seguintes até esse momento."""
+    if at: datetime.datetime.strptime(at, BACKUP_TIMESTAMP_FORMAT) # Valida o formato
+    eligible = [item for item in files if not at or item[0] <= at]
+    bases = [item for item in eligible if item[1] == "base"]
+    if not bases:
+        raise ValueError(f"Nenhuma base de backup encontrada{' até ' + at if at else ''}.")
+    base = bases[-1]
+    deltas = [item for item in eligible if item[1] == "delta" and item[0] > base[0]]
+    return base, deltas
+
+def restore_backup(directory, at=None, output=None, compact=False):
+    """
+    Aplica os deltas à base por ordem (upsert substitui a linha da página, delete remove-a) e grava o resultado.
+    Com compact, o resultado mantém as colunas de controlo e é gravado como uma nova base, que substitui
+    a base e os deltas usados. Devolve o caminho do ficheiro gravado.
+    """
+    base, deltas = select_backup_chain(list_backup_files(directory), at)
+    print(f"--- A reconstruir a base a partir de '{os.path.basename(base[2])}' e {len(deltas)} delta(s) ---")
+    rows, header = {}, []
+    for _, kind, path in [base] + deltas:
+        with _open_csv(path, "r") as csvfile:
+            reader = csv.DictReader(csvfile, delimiter=';')
+            # Propriedades novas (esquema alterado) são acrescentadas ao cabeçalho
+            header += [name for name in reader.fieldnames if name not in header and name not in BACKUP_META_COLUMNS]
+            for row in reader:
+                if row.get("_op") == "delete": rows.pop(row["_page_id"], None)
+                else: rows[row["_page_id"]] = row
+        print(f"   -> {os.path.basename(path)}: {len(rows)} página(s).")
+
+    restored_at = (deltas[-1] if deltas else base)[0]
+    if compact:
+        output = output or os.path.join(directory, f"backup_notion_base_{restored_at}.csv.gz")
+        fieldnames = header + BACKUP_META_COLUMNS
+    else:
+        output = output or f"notion_restaurado_{restored_at}.csv"
+        fieldnames = header
+    ordered_rows = sorted(rows.values(), key=lambda row: row.get("_page_id", ""))
+    with _open_csv(output, "w") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';', restval="", extrasaction='ignore')
+        writer.writeheader()
+        for row in ordered_rows:
+            writer.writerow(dict(row, _op="upsert") if compact else row)
+    print(f"✔ Base reconstruída em '{output}' ({len(ordered_rows)} linhas, estado de {restored_at}).")
+    return output
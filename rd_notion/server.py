@@ -0,0 +1,174 @@
+"""Modo servidor: recebe webhooks do RD Station e sincroniza negociações individuais."""
+import json
+import queue
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from .config import (
+    RD_STAGES_MAP, RD_WEBHOOK_TOKEN, SERVE_HOST, SERVE_INDEX_REFRESH_INTERVAL_MINUTES, SERVE_NOTIFY_INTERVAL_MINUTES,
+    SERVE_PORT, SERVE_RECONCILE_INTERVAL_MINUTES,
+)
+from .leads import LeadIndex
+from .metrics import metrics
+from .notifications import NotificationQueue, divergence_alerts
+from .notion import apply_operation, get_existing_notion_leads
+from .planner import find_notion_page, plan_lead_create, plan_lead_update
+from .rd_station import fetch_rd_station_deal
+from .sync import run_sync
+
+# --- MODO SERVIDOR (WEBHOOKS DO RD STATION) ---
+class WebhookSyncService:
+    """
+    Mantém o índice do Notion em memória e sincroniza negociações individuais recebidas por webhook.
+    Cada escrita atualiza o índice com a página devolvida pelo Notion; a base só é relida (incrementalmente)
+    por um temporizador e na reconciliação. Webhooks, leituras e reconciliação são serializados pelo mesmo lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._queued_ids = set()
+        self._queued_lock = threading.Lock()
+        self.summaries = NotificationQueue("🤖 *Sincronização RD -> Notion (webhooks)*")
+        self.lead_index = LeadIndex()
+
+    def _refresh_index(self):
+        # Leitura incremental: só as páginas editadas desde a última marca (inclui as escritas anteriores)
+        self.lead_index = get_existing_notion_leads()
+
+    def refresh_index(self):
+        with self._lock:
+            self._refresh_index()
+
+    def enqueue(self, deal_id):
+        """Agenda a sincronização de uma negociação; IDs já em fila não são duplicados."""
+        with self._queued_lock:
+            if deal_id in self._queued_ids: return False
+            self._queued_ids.add(deal_id)
+        self._pending.put(deal_id)
+        return True
+
+    def sync_deal(self, deal_id):
+        """Busca a versão atual da negociação no RD e sincroniza só essa página no Notion."""
+        lead = fetch_rd_station_deal(deal_id)
+        if not lead: return
+        deal_stage = lead.get("deal_stage") or {}
+        stage_id = deal_stage.get("id") or deal_stage.get("_id")
+        situacao = RD_STAGES_MAP.get(stage_id)
+        if not situacao:
+            print(f"  -> Negociação {deal_id} está numa etapa não sincronizada ({stage_id}). Ignorada.")
+            return
+        with self._lock:
+            lead_entry, _ = find_notion_page(lead, self.lead_index)
+            operation = plan_lead_update(lead_entry, lead, situacao) if lead_entry else plan_lead_create(lead, situacao)
+            summary = apply_operation(operation, lead_data=lead, lead_index=self.lead_index)
+        if summary: self.summaries.add(summary)
+
+    def reconcile(self):
+        """Sincronização completa (a mesma do modo 'sync'), seguida de um índice novo em memória."""
+        with self._lock:
+            run_sync()
+            self._refresh_index()
+
+    def _worker(self):
+        while True:
+            deal_id = self._pending.get()
+            with self._queued_lock:
+                self._queued_ids.discard(deal_id)
+            try:
+                print(f"\n--- Webhook: a sincronizar a negociação {deal_id} ---")
+                self.sync_deal(deal_id)
+            except Exception as e: # O servidor não pode morrer por causa de uma negociação
+                print(f"### ERRO ao sincronizar a negociação {deal_id}: {e}")
+            finally:
+                self._pending.task_done()
+
+    def _periodic(self, interval_minutes, action):
+        while True:
+            time.sleep(interval_minutes * 60)
+            try:
+                action()
+            except Exception as e:
+                print(f"### ERRO na tarefa periódica do servidor: {e}")
+
+    def start_background_threads(self):
+        threading.Thread(target=self._worker, name="webhook-worker", daemon=True).start()
+        if SERVE_INDEX_REFRESH_INTERVAL_MINUTES > 0:
+            threading.Thread(target=self._periodic, args=(SERVE_INDEX_REFRESH_INTERVAL_MINUTES, self.refresh_index), name="index-refresh", daemon=True).start()
+        if SERVE_RECONCILE_INTERVAL_MINUTES > 0:
+            threading.Thread(target=self._periodic, args=(SERVE_RECONCILE_INTERVAL_MINUTES, self.reconcile), name="reconcile", daemon=True).start()
+        threading.Thread(target=self._periodic, args=(SERVE_NOTIFY_INTERVAL_MINUTES, self.flush_notifications), name="notify", daemon=True).start()
+
+    def flush_notifications(self):
+        divergence_alerts.flush()
+        self.summaries.flush()
+
+def _extract_deal_id(payload):
+    """Extrai o ID da negociação do corpo de um webhook do RD (formato {event_name, document} ou a negociação direta)."""
+    document = payload.get("document") if isinstance(payload.get("document"), dict) else payload
+    return document.get("id") or document.get("_id")
+
+class RDWebhookHandler(BaseHTTPRequestHandler):
+    service = None # Definido em run_server()
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._reply(200, {"status": "ok"})
+        elif path == "/metrics":
+            data = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        if parsed.path != "/webhooks/rd":
+            self._reply(404, {"error": "not found"}); return
+        token = parse_qs(parsed.query).get("token", [""])[0] or self.headers.get("X-Webhook-Token", "")
+        if RD_WEBHOOK_TOKEN and token != RD_WEBHOOK_TOKEN:
+            self._reply(401, {"error": "unauthorized"}); return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            deal_id = _extract_deal_id(payload)
+        except (ValueError, AttributeError):
+            self._reply(400, {"error": "invalid json"}); return
+        if not deal_id:
+            self._reply(400, {"error": "deal id not found"}); return
+        # Responde logo ao RD; a sincronização corre na thread de trabalho
+        queued = self.service.enqueue(deal_id)
+        self._reply(202, {"deal_id": deal_id, "queued": queued, "event": payload.get("event_name")})
+
+    def log_message(self, format, *args):
+        print(f"[webhook] {self.address_string()} - {format % args}")
+
+def run_server(host=SERVE_HOST, port=SERVE_PORT):
+    """Servidor HTTP que recebe webhooks do RD Station (negociação criada/atualizada/mudança de etapa)."""
+    print(f"\n--- A INICIAR MODO SERVIDOR RD -> NOTION em {host}:{port} ---")
+    service = WebhookSyncService()
+    service.refresh_index()
+    service.start_background_threads()
+    RDWebhookHandler.service = service
+    server = ThreadingHTTPServer((host, port), RDWebhookHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nA terminar o servidor...")
+    finally:
+        server.server_close()
+        service.flush_notifications()
@@ -0,0 +1,296 @@
+"""Sincronização completa RD Station -> Notion."""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .config import DEAL_FINGERPRINTS_FILE, FORCE_FULL_RESCAN, NOTION_MAX_WORKERS, SYNC_WRITE_BATCH_SIZE
+from .journal import SyncJournal
+from .metrics import metrics
+from .notifications import divergence_alerts, send_whatsapp_message
+from .notion import NotionQueryError, apply_operation, create_summary, find_page_by_rd_id, get_existing_notion_leads
+from .pipelines import DEFAULT_PIPELINE
+from .planner import build_sync_plan
+from .rd_station import RDFetchError, iter_rd_station_deals
+
+# --- IMPRESSÕES DIGITAIS DAS NEGOCIAÇÕES (DETEÇÃO DE ALTERAÇÕES) ---
+def load_deal_fingerprints(filename=None):
+    """Lê as impressões digitais gravadas na última execução ({deal_id: {fingerprint, updated_at, page_id, last_edited_time}})."""
+    filename = filename or DEAL_FINGERPRINTS_FILE
+    if FORCE_FULL_RESCAN or not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"!! Aviso: Impressões digitais locais ilegíveis, todos os leads serão comparados: {e}")
+        return {}
+
+def save_deal_fingerprints(fingerprints, filename=None):
+    filename = filename or DEAL_FINGERPRINTS_FILE
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    tmp_filename = filename + ".tmp"
+    try:
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(fingerprints, f, separators=(",", ":"))
+        os.replace(tmp_filename, filename)
+    except IOError as e:
+        print(f"!! Aviso: Não foi possível gravar as impressões digitais das negociações: {e}")
+
+# --- EXECUÇÃO DO PLANO ---
+def _resume_record(operation, journal, fingerprint):
+    """
+    Registo do diário que dispensa a operação numa retoma, ou None.
+    Uma criação já registada nunca é repetida; as restantes só são dispensadas se os dados do RD não mudaram.
+    """
+    record = journal.completed.get(operation["rd_id"]) if journal else None
+    if not record: return None
+    if operation["op"] == "create" and record.get("page_id"): return record
+    return record if record.get("fingerprint") == fingerprint else None
+
+def _apply_idempotent(operation, journal, pipeline, lead_data=None):
+    """
+    Aplica uma operação sem nunca duplicar páginas. Dentro da execução, uma criação repetida procura antes
+    a página pelo ID do RD (ver _create_lead_page); numa retoma, a primeira tentativa também, porque a execução
+    anterior pode ter parado logo após o POST. Erros de rede numa operação não interrompem as restantes.
+    """
+    try:
+        if journal and journal.resumed and operation["op"] == "create":
+            page_id = find_page_by_rd_id(operation["rd_id"], pipeline)
+            if page_id:
+                print(f"  -> Lead '{operation['name']}' já existe no Notion (página {page_id}); criação ignorada.")
+                operation["page_id"], operation["reason"] = page_id, "recovered"
+                return create_summary(operation)
+        return apply_operation(operation, pipeline, lead_data=lead_data)
+    except (requests.exceptions.RequestException, NotionQueryError) as e:
+        print(f"  ### ERRO ao aplicar a operação '{operation['op']}' do lead '{operation['name']}': {e}")
+        return None
+
+def execute_plan(plan, journal=None, batch_size=None, pipeline=None):
+    """
+    Aplica as operações pendentes do plano na base do pipeline (por omissão, NOTION_DATABASE_ID) em lotes,
+    com um pool de workers dimensionado pelo número de escritas.
+    Cada resultado é registado no diário (se houver) e o diário é gravado em disco no fim de cada lote.
+    Devolve [(operação, resumo)] pela ordem do plano; o resumo é None quando a escrita falhou.
+    """
+    pipeline = pipeline or DEFAULT_PIPELINE
+    batch_size = max(1, batch_size or SYNC_WRITE_BATCH_SIZE)
+    results, pending = [], []
+    planned_ids = {operation["rd_id"] for operation in plan.pending()}
+    # Escritas da execução interrompida que já não constam do plano (ex: a página criada já está no índice):
+    # os seus resumos nunca foram enviados e entram no relatório desta execução
+    for rd_id, record in (journal.completed.items() if journal else ()):
+        if rd_id not in planned_ids and record.get("summary"):
+            results.append(({"op": record["op"], "rd_id": rd_id, "name": record.get("name"), "page_id": record.get("page_id"),
+                             "status_divergence": None, "last_edited_time": record.get("last_edited_time"), "reason": "resumed"}, record["summary"]))
+    for operation in plan.pending():
+        fingerprint = plan.fingerprints.get(operation["rd_id"], {}).get("fingerprint")
+        record = _resume_record(operation, journal, fingerprint)
+        if record is None:
+            pending.append(operation); continue
+        # Já aplicada pela execução interrompida: só o alerta de divergência (nunca enviado) é repetido
+        if operation["status_divergence"]: apply_operation(dict(operation, op="divergence"), pipeline)
+        # O relatório usa o tipo da operação que foi de facto aplicada (ex: a criação, hoje planeada como atualização)
+        stale = record.get("fingerprint") != fingerprint
+        operation = dict(operation, op=record["op"], page_id=record.get("page_id") or operation["page_id"],
+                         last_edited_time=record.get("last_edited_time"), reason="recovered" if stale else "resumed")
+        results.append((operation, record.get("summary")))
+    if results:
+        print(f"{len(results)} operação(ões) já aplicada(s) pela execução interrompida; não serão repetidas.")
+
+    writes = sum(1 for operation in pending if operation["op"] in ("create", "update"))
+    if not pending: return results
+    workers = max(1, min(NOTION_MAX_WORKERS, writes))
+    batches = (len(pending) + batch_size - 1) // batch_size
+    print(f"\n{pipeline.prefix}A aplicar {len(pending)} operação(ões) ({writes} escrita(s)) em {batches} lote(s) com {workers} worker(s)...")
+    def apply(operation):
+        return _apply_idempotent(operation, journal, pipeline, plan.deals.get(operation["rd_id"]))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            for operation, summary in zip(batch, executor.map(apply, batch)):
+                if journal:
+                    journal.record(operation, summary, plan.fingerprints.get(operation["rd_id"], {}).get("fingerprint"))
+                results.append((operation, summary))
+            if journal: journal.checkpoint()
+            print(f"  {pipeline.prefix}Lote {start // batch_size + 1}/{batches} concluído ({len(results)} operações aplicadas).")
+    return results
+
+
+# --- PLANEAMENTO POR PIPELINE ---
+def _plan_single_pipeline(pipeline):
+    """Um só pipeline: o plano é construído à medida que as páginas do RD chegam."""
+    with metrics.phase("notion_scan"):
+        lead_index = get_existing_notion_leads(pipeline)
+    previous_fingerprints = load_deal_fingerprints(pipeline.fingerprints_file)
+
+    print(f"\nA buscar negociações de {len(pipeline.stages_map)} etapa(s) do RD e a planear as alterações...")
+    incomplete_stages = set()
+    with metrics.phase("rd_fetch_and_plan"):
+        deal_stream = iter_rd_station_deals(list(pipeline.stages_map), pipeline.stages_map, incomplete_stages)
+        plan = build_sync_plan(deal_stream, lead_index, previous_fingerprints, pipeline.stages_map)
+    plan.incomplete_stages = sorted(incomplete_stages)
+    return plan
+
+def _plan_pipelines(pipelines):
+    """
+    Vários pipelines: as bases do Notion são lidas em paralelo enquanto as negociações de todas as etapas
+    são buscadas numa única leitura do RD (etapas comuns a vários pipelines só são pedidas uma vez).
+    Devolve os planos pela ordem dos pipelines.
+    """
+    stage_names = {}
+    for pipeline in pipelines:
+        for stage_id, situacao in pipeline.stages_map.items():
+            stage_names.setdefault(stage_id, situacao)
+    print(f"\nA ler {len(pipelines)} base(s) do Notion e a buscar negociações de {len(stage_names)} etapa(s) do RD...")
+    incomplete_stages = set()
+    with ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
+        scans = [executor.submit(get_existing_notion_leads, pipeline) for pipeline in pipelines]
+        with metrics.phase("rd_fetch"):
+            deals = list(iter_rd_station_deals(list(stage_names), stage_names, incomplete_stages))
+        # Tempo de leitura do Notion que não ficou escondido atrás da leitura do RD
+        with metrics.phase("notion_scan_wait"):
+            lead_indexes = [scan.result() for scan in scans]
+
+    plans = []
+    with metrics.phase("plan"):
+        for pipeline, lead_index in zip(pipelines, lead_indexes):
+            deal_stream = [item for item in deals if item[0] in pipeline.stages_map]
+            previous_fingerprints = load_deal_fingerprints(pipeline.fingerprints_file)
+            plan = build_sync_plan(deal_stream, lead_index, previous_fingerprints, pipeline.stages_map)
+            plan.incomplete_stages = sorted(incomplete_stages & set(pipeline.stages_map))
+            plans.append(plan)
+    return plans
+
+def _print_plan_summary(pipeline, plan):
+    for stage_id, notion_situacao in pipeline.stages_map.items():
+        print(f"{pipeline.prefix}Etapa do RD {stage_id} ('{notion_situacao}'): {plan.deals_per_stage[notion_situacao]} lead(s).")
+    skipped_unchanged = sum(1 for operation in plan.operations if operation["reason"] == "fingerprint")
+    metrics.incr("deals_seen", sum(plan.deals_per_stage.values()))
+    metrics.incr("deals_duplicated", len(plan.duplicates))
+    metrics.incr("deals_skipped_unchanged", skipped_unchanged)
+    metrics.incr("conflicting_matches", plan.conflicting_matches)
+
+    print(f"{pipeline.prefix}{skipped_unchanged} lead(s) ignorado(s) por não terem alterações desde a última sincronização.")
+    if plan.conflicting_matches:
+        print(f"!! Aviso: {pipeline.prefix}{plan.conflicting_matches} lead(s) com correspondências em conflito no Notion (ver avisos acima).")
+    if plan.incomplete_stages:
+        metrics.incr("rd_incomplete_stages", len(plan.incomplete_stages))
+        print(f"### ERRO: {pipeline.prefix}Etapas do RD não lidas por completo: {_stage_labels(pipeline, plan)}. "
+              "As negociações em falta não serão sincronizadas nesta execução.")
+
+def _stage_labels(pipeline, plan):
+    return ", ".join(f"'{pipeline.stages_map[stage_id]}' ({stage_id})" for stage_id in plan.incomplete_stages)
+
+def _apply_pipeline_plan(pipeline, plan):
+    """
+    Aplica o plano de um pipeline com o seu diário e grava as impressões digitais.
+    Devolve (diário, resumos das criações, resumos das atualizações); o diário só é fechado depois do relatório.
+    """
+    created_leads_summary, updated_leads_summary = [], []
+    counts = plan.counts()
+    skipped_unchanged = sum(1 for operation in plan.operations if operation["reason"] == "fingerprint")
+    # O diário permite retomar esta execução se ela for interrompida a meio das escritas
+    journal = SyncJournal(pipeline.journal_file, pipeline.database_id).open()
+    results = execute_plan(plan, journal, pipeline=pipeline)
+
+    new_fingerprints = dict(plan.fingerprints)
+    for operation, summary in results:
+        if operation["reason"] in ("resumed", "recovered"): metrics.incr(f"deals_{operation['reason']}")
+        if summary is None or operation["reason"] == "recovered" or operation["status_divergence"]:
+            # Erro, página recuperada com dados possivelmente antigos, ou Status divergente (o alerta repete-se
+            # enquanto a divergência durar): volta a ser comparada na próxima execução
+            new_fingerprints.pop(operation["rd_id"], None)
+            if summary is None:
+                metrics.incr("write_errors"); continue
+        elif operation["rd_id"] in new_fingerprints:
+            entry = dict(new_fingerprints[operation["rd_id"]], page_id=operation["page_id"])
+            if operation["op"] in ("create", "update"): entry["last_edited_time"] = operation.get("last_edited_time")
+            new_fingerprints[operation["rd_id"]] = entry
+        if operation["op"] == "create": created_leads_summary.append(summary)
+        elif operation["op"] == "update" and summary: updated_leads_summary.append(summary)
+    # Só leads com página conhecida podem ser ignorados
+    save_deal_fingerprints({rd_lead_id: entry for rd_lead_id, entry in new_fingerprints.items() if entry["page_id"]},
+                           pipeline.fingerprints_file)
+    metrics.incr("deals_unchanged", counts["skip"] + counts["divergence"] - skipped_unchanged)
+    metrics.incr("deals_created", len(created_leads_summary))
+    metrics.incr("deals_updated", len(updated_leads_summary))
+    return journal, created_leads_summary, updated_leads_summary
+
+def _report_section(created_leads_summary, updated_leads_summary):
+    section = ""
+    if created_leads_summary:
+        section += "✅ *Novos Leads Adicionados ao Notion*\n\n" + "\n\n".join(created_leads_summary)
+    if updated_leads_summary:
+        if section: section += "\n\n---\n\n"
+        section += "🔄 *Leads Existentes que Foram Atualizados*\n\n" + "\n".join(updated_leads_summary)
+    return section
+
+# --- SINCRONIZAÇÃO COMPLETA ---
+def run_sync(dry_run=False, plan_file=None, pipelines=None):
+    """
+    Sincroniza as negociações do RD Station com a(s) base(s) do Notion e envia um único relatório final.
+    pipelines é a lista de pipelines a sincronizar (por omissão, só o de NOTION_DATABASE_ID + RD_STAGES_MAP);
+    todos partilham as sessões HTTP, os limitadores por token e uma única leitura do RD.
+    Com dry_run, só constrói e mostra os planos (gravados em plan_file, ou no plano de cada pipeline),
+    sem escrever nada nem enviar mensagens, e devolve o plano (a lista de planos, com vários pipelines).
+    Se alguma etapa do RD não foi lida por completo, as negociações lidas são sincronizadas, o relatório
+    avisa que a execução ficou incompleta e, no fim, é levantado RDFetchError.
+    """
+    pipelines = pipelines or [DEFAULT_PIPELINE]
+    mode = "SIMULAÇÃO (DRY-RUN)" if dry_run else "MODO DE PRODUÇÃO"
+    print(f"\n--- A INICIAR SINCRONIZAÇÃO RD -> NOTION ({mode}) ---")
+    if len(pipelines) > 1:
+        print(f"Pipelines: {', '.join(pipeline.name for pipeline in pipelines)}.")
+    run_started = time.monotonic()
+    plans = [_plan_single_pipeline(pipelines[0])] if len(pipelines) == 1 else _plan_pipelines(pipelines)
+    for pipeline, plan in zip(pipelines, plans):
+        _print_plan_summary(pipeline, plan)
+
+    if dry_run:
+        for pipeline, plan in zip(pipelines, plans):
+            if pipeline.name: print(f"\n=== Pipeline '{pipeline.name}' ===")
+            plan.print_plan()
+            pipeline_plan_file = plan_file if plan_file and len(pipelines) == 1 else pipeline.plan_file
+            plan.save(pipeline_plan_file)
+            print(f"\nPlano gravado em '{pipeline_plan_file}'. Nenhuma escrita foi feita no Notion.")
+        metrics.add_phase_time("sync_total", time.monotonic() - run_started)
+        return plans[0] if len(plans) == 1 else plans
+
+    # Os pipelines escrevem em paralelo; o limitador de cada token mantém o ritmo dentro do limite do Notion
+    with metrics.phase("notion_writes"), ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
+        applied = list(executor.map(_apply_pipeline_plan, pipelines, plans))
+    journals, sections = [], []
+    for pipeline, (journal, created_leads_summary, updated_leads_summary) in zip(pipelines, applied):
+        journals.append(journal)
+        section = _report_section(created_leads_summary, updated_leads_summary)
+        if section: sections.append(f"📂 *{pipeline.name}*\n\n{section}" if pipeline.name else section)
+
+    notify_started = time.monotonic()
+    divergence_alerts.flush()
+
+    print("\n--- A preparar o relatório final da sincronização ---")
+    final_report = "🤖 *Relatório da Sincronização RD -> Notion*\n\n"
+    incomplete = [(pipeline, plan) for pipeline, plan in zip(pipelines, plans) if plan.incomplete_stages]
+    if incomplete:
+        final_report += "⚠️ *Sincronização incompleta*: etapas do RD não lidas por completo\n" + "\n".join(
+            f"- {pipeline.prefix}{_stage_labels(pipeline, plan)}" for pipeline, plan in incomplete) + "\n\n---\n\n"
+    if sections:
+        final_report += "\n\n---\n\n".join(sections)
+        send_whatsapp_message(final_report)
+    else:
+        final_report += "✅ Nenhuma alteração foi realizada nesta execução."
+        send_whatsapp_message(final_report)
+        print("Nenhuma alteração foi realizada. Relatório de 'sem alterações' enviado.")
+    # Só depois do relatório enviado a execução fica concluída; uma retoma não o repete
+    for journal in journals:
+        journal.finish()
+    metrics.add_phase_time("notifications", time.monotonic() - notify_started)
+    metrics.add_phase_time("sync_total", time.monotonic() - run_started)
+
+    if incomplete:
+        raise RDFetchError(f"Sincronização incompleta: {sum(len(plan.incomplete_stages) for _, plan in incomplete)} etapa(s) do RD não lida(s) por completo.")
+    print("\n--- SCRIPT DE SINCRONIZAÇÃO FINALIZADO ---")